@@ -0,0 +1,188 @@
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any, List, Optional
+from database import get_database, verify_indexes
+from blob_store import load_project_files
+from project_versions import ensure_manifest
+from chat_messages import migrate_history, attach_messages
+from search_index import index_project, index_chat_messages, remove_chat
+from http_client import outbound_http
+from github_cache import github_cache
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+# Query shape of every hot lookup in the route layer. Values are
+# placeholders: explain only cares about which fields are filtered/sorted.
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"route": "GET /api/projects/{id}", "collection": "projects", "filter": {"id": "x"}},
+    {"route": "DELETE /api/projects/{id}", "collection": "projects", "filter": {"id": "x"}},
+    {
+        "route": "GET /api/projects/",
+        "collection": "projects",
+        "filter": {},
+        "sort": {"created_at": -1, "id": -1}
+    },
+    {
+        "route": "GET /api/projects/?userId=",
+        "collection": "projects",
+        "filter": {"userId": "x"},
+        "sort": {"created_at": -1, "id": -1}
+    },
+    {"route": "GET /api/chat-history/{id}", "collection": "chat_histories", "filter": {"id": "x"}},
+    {
+        "route": "GET /api/chat-history/?userId=",
+        "collection": "chat_histories",
+        "filter": {"userId": "x"},
+        "sort": {"created_at": -1, "id": -1}
+    },
+    {
+        "route": "GET /api/chat-history/user/{userId}/project/{projectId}",
+        "collection": "chat_histories",
+        "filter": {"userId": "x", "projectId": "x"},
+        "sort": {"updated_at": -1, "id": -1}
+    },
+    {
+        "route": "GET /api/chat-history/{id}/messages",
+        "collection": "chat_message_buckets",
+        "filter": {"historyId": "x", "bucket": {"$gte": 0, "$lte": 1}},
+        "sort": {"bucket": 1}
+    },
+    {
+        "route": "GET /api/search/?userId=&q=",
+        "collection": "search_documents",
+        "filter": {"userId": "x", "$text": {"$search": "x"}}
+    },
+    {"route": "POST /api/github-sync/sync", "collection": "projects", "filter": {"id": "x"}},
+    {"route": "GET /api/github-sync/jobs/{id}", "collection": "github_sync_jobs", "filter": {"id": "x"}},
+    {
+        "route": "GET /api/usage/?userId=",
+        "collection": "usage_daily",
+        "filter": {"userId": "x", "day": {"$gte": "2000-01-01"}}
+    }
+]
+
+def collect_stages(plan: Dict[str, Any], stages: List[str], indexes: List[str]):
+    stages.append(plan.get("stage"))
+    if plan.get("indexName"):
+        indexes.append(plan["indexName"])
+    for child_key in ("inputStage", "outerStage", "innerStage"):
+        if child_key in plan:
+            collect_stages(plan[child_key], stages, indexes)
+    for child in plan.get("inputStages", []):
+        collect_stages(child, stages, indexes)
+
+async def explain_shape(db, shape: Dict[str, Any]) -> Dict[str, Any]:
+    find: Dict[str, Any] = {"find": shape["collection"], "filter": shape["filter"]}
+    if shape.get("sort"):
+        find["sort"] = shape["sort"]
+    
+    result = await db.command({"explain": find, "verbosity": "queryPlanner"})
+    winning_plan = result.get("queryPlanner", {}).get("winningPlan", {})
+    # Slot-based engine (MongoDB 5+) nests the classic plan under queryPlan.
+    winning_plan = winning_plan.get("queryPlan", winning_plan)
+    
+    stages: List[str] = []
+    indexes: List[str] = []
+    collect_stages(winning_plan, stages, indexes)
+    
+    return {
+        "route": shape["route"],
+        "collection": shape["collection"],
+        "filter": shape["filter"],
+        "sort": shape.get("sort"),
+        "stages": stages,
+        "indexes": indexes,
+        "collectionScan": "COLLSCAN" in stages,
+        "inMemorySort": "SORT" in stages
+    }
+
+@router.get("/query-plans")
+async def get_query_plans(collection: Optional[str] = None):
+    """Explain each route's query shape and flag collection scans or in-memory sorts"""
+    db = get_database()
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    
+    shapes = [shape for shape in QUERY_SHAPES if not collection or shape["collection"] == collection]
+    plans = [await explain_shape(db, shape) for shape in shapes]
+    
+    return {
+        "plans": plans,
+        "collectionScans": [plan["route"] for plan in plans if plan["collectionScan"]],
+        "missingIndexes": await verify_indexes(db)
+    }
+
+@router.get("/http")
+async def get_http_stats():
+    """Per-host request, connection reuse and retry counters of the shared
+    outbound HTTP clients, and the GitHub ETag cache and rate-limit state"""
+    return {**outbound_http.get_stats(), "github": github_cache.get_stats()}
+
+@router.post("/migrations/project-files")
+async def migrate_project_files(batchSize: int = 100):
+    """Move inline project files into the blob store, one batch per call"""
+    db = get_database()
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    
+    legacy = {"manifest": {"$exists": False}}
+    projects = await db.projects.find(legacy, {"id": 1, "files": 1}).to_list(batchSize)
+    
+    for project in projects:
+        await ensure_manifest(db, project)
+    
+    return {
+        "migrated": len(projects),
+        "remaining": await db.projects.count_documents(legacy)
+    }
+
+@router.post("/migrations/chat-buckets")
+async def migrate_chat_buckets(batchSize: int = 100):
+    """Move inline chat messages into bucket documents, one batch per call"""
+    db = get_database()
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    
+    legacy = {"messages": {"$exists": True}}
+    histories = await db.chat_histories.find(legacy, {"id": 1}).to_list(batchSize)
+    
+    migrated = 0
+    for history in histories:
+        migrated += 1 if await migrate_history(db, history["id"]) else 0
+    
+    return {
+        "migrated": migrated,
+        "remaining": await db.chat_histories.count_documents(legacy)
+    }
+
+@router.post("/migrations/search-index")
+async def rebuild_search_index(kind: str = "projects", after: Optional[str] = None, batchSize: int = 50):
+    """(Re)index existing projects or chats for search, one batch per call;
+    pass nextAfter back as after= until it is null"""
+    if kind not in ("projects", "chats"):
+        raise HTTPException(status_code=400, detail="kind must be projects or chats")
+    
+    db = get_database()
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    
+    query = {"userId": {"$ne": None}}
+    if after:
+        query["id"] = {"$gt": after}
+    
+    if kind == "projects":
+        projects = await db.projects.find(query).sort("id", 1).to_list(batchSize)
+        for project in projects:
+            await index_project(db, project, await load_project_files(db, project))
+        items = projects
+    else:
+        histories = await db.chat_histories.find(query).sort("id", 1).to_list(batchSize)
+        await attach_messages(db, histories)
+        for history in histories:
+            await remove_chat(db, history["id"])
+            await index_chat_messages(db, history, 0, history["messages"])
+        items = histories
+    
+    return {
+        "indexed": len(items),
+        "nextAfter": items[-1]["id"] if len(items) == batchSize else None
+    }
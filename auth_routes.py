@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse
-import httpx
 import os
 from schemas import GoogleDriveAuthRequest, GitHubAuthRequest
 from database import get_database
+from http_client import outbound_http
+from github_client import github_client, github_get
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -39,41 +40,40 @@ async def google_callback(request: GoogleDriveAuthRequest):
     if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
         raise HTTPException(status_code=500, detail="Google OAuth not configured")
     
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "code": request.code,
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "redirect_uri": GOOGLE_REDIRECT_URI,
-                "grant_type": "authorization_code"
-            }
-        )
-        
-        if token_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to exchange code for token")
-        
-        tokens = token_response.json()
-        
-        userinfo_response = await client.get(
-            "https://www.googleapis.com/oauth2/v2/userinfo",
-            headers={"Authorization": f"Bearer {tokens['access_token']}"}
-        )
-        
-        if userinfo_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get user info")
-        
-        user_info = userinfo_response.json()
-        
-        return {
-            "success": True,
-            "accessToken": tokens.get("access_token"),
-            "refreshToken": tokens.get("refresh_token"),
-            "expiresIn": tokens.get("expires_in"),
-            "userEmail": user_info.get("email"),
-            "userName": user_info.get("name")
+    token_response = await outbound_http.client("https://oauth2.googleapis.com").post(
+        "/token",
+        data={
+            "code": request.code,
+            "client_id": GOOGLE_CLIENT_ID,
+            "client_secret": GOOGLE_CLIENT_SECRET,
+            "redirect_uri": GOOGLE_REDIRECT_URI,
+            "grant_type": "authorization_code"
         }
+    )
+    
+    if token_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to exchange code for token")
+    
+    tokens = token_response.json()
+    
+    userinfo_response = await outbound_http.client("https://www.googleapis.com").get(
+        "/oauth2/v2/userinfo",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"}
+    )
+    
+    if userinfo_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get user info")
+    
+    user_info = userinfo_response.json()
+    
+    return {
+        "success": True,
+        "accessToken": tokens.get("access_token"),
+        "refreshToken": tokens.get("refresh_token"),
+        "expiresIn": tokens.get("expires_in"),
+        "userEmail": user_info.get("email"),
+        "userName": user_info.get("name")
+    }
 
 @router.get("/github/authorize")
 async def github_authorize():
@@ -96,78 +96,68 @@ async def github_callback(request: GitHubAuthRequest):
     if not GITHUB_CLIENT_ID or not GITHUB_CLIENT_SECRET:
         raise HTTPException(status_code=500, detail="GitHub OAuth not configured")
     
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(
-            "https://github.com/login/oauth/access_token",
-            headers={"Accept": "application/json"},
-            data={
-                "client_id": GITHUB_CLIENT_ID,
-                "client_secret": GITHUB_CLIENT_SECRET,
-                "code": request.code,
-                "redirect_uri": GITHUB_REDIRECT_URI
-            }
-        )
-        
-        if token_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to exchange code for token")
-        
-        tokens = token_response.json()
-        
-        if "error" in tokens:
-            raise HTTPException(status_code=400, detail=tokens.get("error_description", "OAuth error"))
-        
-        access_token = tokens.get("access_token")
-        
-        user_response = await client.get(
-            "https://api.github.com/user",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-        )
-        
-        if user_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get user info")
-        
-        user_info = user_response.json()
-        
-        return {
-            "success": True,
-            "accessToken": access_token,
-            "username": user_info.get("login"),
-            "email": user_info.get("email"),
-            "name": user_info.get("name"),
-            "avatarUrl": user_info.get("avatar_url")
+    token_response = await outbound_http.client("https://github.com").post(
+        "/login/oauth/access_token",
+        headers={"Accept": "application/json"},
+        data={
+            "client_id": GITHUB_CLIENT_ID,
+            "client_secret": GITHUB_CLIENT_SECRET,
+            "code": request.code,
+            "redirect_uri": GITHUB_REDIRECT_URI
         }
+    )
+    
+    if token_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to exchange code for token")
+    
+    tokens = token_response.json()
+    
+    if "error" in tokens:
+        raise HTTPException(status_code=400, detail=tokens.get("error_description", "OAuth error"))
+    
+    access_token = tokens.get("access_token")
+    
+    user_response = await github_get(github_client(), "/user", access_token)
+    
+    if user_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get user info")
+    
+    user_info = user_response.json()
+    
+    return {
+        "success": True,
+        "accessToken": access_token,
+        "username": user_info.get("login"),
+        "email": user_info.get("email"),
+        "name": user_info.get("name"),
+        "avatarUrl": user_info.get("avatar_url")
+    }
 
 @router.get("/github/repos")
 async def get_github_repos(accessToken: str):
     """Get user's GitHub repositories"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://api.github.com/user/repos",
-            headers={
-                "Authorization": f"Bearer {accessToken}",
-                "Accept": "application/vnd.github.v3+json"
-            },
-            params={"per_page": 100, "sort": "updated"}
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to fetch repositories")
-        
-        repos = response.json()
-        
-        return {
-            "success": True,
-            "repos": [
-                {
-                    "name": repo["name"],
-                    "fullName": repo["full_name"],
-                    "url": repo["html_url"],
-                    "private": repo["private"],
-                    "description": repo.get("description", "")
-                }
-                for repo in repos
-            ]
-        }
+    response = await github_get(
+        github_client(),
+        "/user/repos",
+        accessToken,
+        params={"per_page": 100, "sort": "updated"}
+    )
+    
+    if response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to fetch repositories")
+    
+    repos = response.json()
+    
+    return {
+        "success": True,
+        "repos": [
+            {
+                "name": repo["name"],
+                "fullName": repo["full_name"],
+                "url": repo["html_url"],
+                "private": repo["private"],
+                "description": repo.get("description", "")
+            }
+            for repo in repos
+        ]
+    }
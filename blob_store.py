@@ -0,0 +1,153 @@
+import os
+import json
+import zlib
+import hashlib
+from collections import Counter
+from bson import Binary
+from pymongo import UpdateOne
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
+BLOB_FETCH_BATCH_SIZE = int(os.getenv("BLOB_FETCH_BATCH_SIZE", "500"))
+
+# Content-addressed storage for project files. Each distinct file body is
+# stored once in `file_blobs` under its sha256, zlib-compressed, with a
+# reference count; projects keep only a path -> hash manifest.
+
+def encode_path(path: str) -> str:
+    """Escape a file path so it can be used as a MongoDB field name"""
+    return path.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def decode_path(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+def serialize_content(content: Any) -> bytes:
+    # File values are usually strings but may be dicts ({"content": ...});
+    # JSON keeps both round-trippable.
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode()
+
+def hash_content(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def file_content_text(content: Any) -> str:
+    if isinstance(content, dict):
+        content = content.get("content", "")
+    return str(content)
+
+def build_blobs(files: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, bytes]]:
+    """Hash files into (manifest of encoded path -> hash, hash -> serialized body)"""
+    manifest = {}
+    bodies = {}
+    for path, content in files.items():
+        data = serialize_content(content)
+        digest = hash_content(data)
+        manifest[encode_path(path)] = digest
+        bodies[digest] = data
+    return manifest, bodies
+
+async def store_blobs(db, bodies: Dict[str, bytes], references: Counter):
+    """Upsert blobs and add `references[hash]` to each one's refcount in one bulk write"""
+    if not references:
+        return
+    
+    operations = []
+    for digest, count in references.items():
+        update: Dict[str, Any] = {"$inc": {"refs": count}}
+        if digest in bodies:
+            data = bodies[digest]
+            update["$setOnInsert"] = {
+                "data": Binary(zlib.compress(data, BLOB_COMPRESSION_LEVEL)),
+                "compression": "zlib",
+                "size": len(data)
+            }
+        operations.append(UpdateOne({"_id": digest}, update, upsert=digest in bodies))
+    await db.file_blobs.bulk_write(operations, ordered=False)
+
+async def put_files(db, files: Dict[str, Any]) -> Dict[str, str]:
+    manifest, bodies = build_blobs(files)
+    await store_blobs(db, bodies, Counter(manifest.values()))
+    return manifest
+
+async def release_blobs(db, hashes: Iterable[str]):
+    """Drop one reference per hash occurrence and delete blobs nobody references"""
+    references = Counter(hashes)
+    if not references:
+        return
+    
+    await db.file_blobs.bulk_write(
+        [UpdateOne({"_id": digest}, {"$inc": {"refs": -count}}) for digest, count in references.items()],
+        ordered=False
+    )
+    await db.file_blobs.delete_many({"_id": {"$in": list(references)}, "refs": {"$lte": 0}})
+
+async def fetch_blob_batch(db, hashes: List[str]) -> Dict[str, Any]:
+    contents = {}
+    async for blob in db.file_blobs.find({"_id": {"$in": hashes}}, {"refs": 0}):
+        data = blob["data"]
+        if blob.get("compression") == "zlib":
+            data = zlib.decompress(data)
+        contents[blob["_id"]] = json.loads(data)
+    return contents
+
+async def fetch_blobs(db, hashes: Iterable[str]) -> Dict[str, Any]:
+    """Load and decode blobs with batched $in queries"""
+    unique = list(dict.fromkeys(hashes))
+    contents = {}
+    for start in range(0, len(unique), BLOB_FETCH_BATCH_SIZE):
+        contents.update(await fetch_blob_batch(db, unique[start:start + BLOB_FETCH_BATCH_SIZE]))
+    return contents
+
+async def iter_manifest_files(db, manifest: Dict[str, str], batch_size: int = BLOB_FETCH_BATCH_SIZE):
+    """Yield (path, content) in path order, holding at most one batch of blobs in memory"""
+    keys = sorted(manifest, key=decode_path)
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        contents = await fetch_blob_batch(db, list({manifest[key] for key in batch}))
+        for key in batch:
+            yield decode_path(key), contents.get(manifest[key], "")
+
+def manifest_etag(manifest: Dict[str, str]) -> str:
+    """Content hash of a manifest; equal file sets give equal tags"""
+    digest = hashlib.sha256()
+    for key in sorted(manifest):
+        digest.update(f"{key}\0{manifest[key]}\n".encode())
+    return digest.hexdigest()
+
+async def resolve_manifests(
+    db,
+    manifests: List[Dict[str, str]],
+    paths: Optional[Iterable[str]] = None
+) -> List[Dict[str, Any]]:
+    """Resolve several manifests with one round of blob fetches; `paths`
+    limits resolution to those file paths"""
+    wanted = {encode_path(path) for path in paths} if paths is not None else None
+    selected = [
+        {key: digest for key, digest in manifest.items() if wanted is None or key in wanted}
+        for manifest in manifests
+    ]
+    contents = await fetch_blobs(db, (digest for manifest in selected for digest in manifest.values()))
+    return [
+        {decode_path(key): contents.get(digest, "") for key, digest in manifest.items()}
+        for manifest in selected
+    ]
+
+def project_manifest(project: Dict[str, Any]) -> Dict[str, str]:
+    """Manifest of a project document; legacy inline files are hashed in place"""
+    if "manifest" in project:
+        return project["manifest"]
+    manifest, _ = build_blobs(project.get("files") or {})
+    return manifest
+
+async def load_project_files(db, project: Dict[str, Any], paths: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Files of a project document, whether stored as a manifest or inline (legacy)"""
+    if "manifest" not in project:
+        files = project.get("files") or {}
+        if paths is None:
+            return files
+        return {path: files[path] for path in paths if path in files}
+    
+    resolved = await resolve_manifests(db, [project["manifest"]], paths)
+    return resolved[0]
+
+def manifest_paths(manifest: Dict[str, str]) -> List[str]:
+    return [decode_path(key) for key in manifest]
@@ -1,22 +1,42 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import List, Optional
 from datetime import datetime
 import uuid
-from schemas import ChatHistorySchema, CreateChatHistoryRequest, UpdateChatHistoryRequest
-from database import get_database
+from schemas import (
+    ChatHistorySchema,
+    CreateChatHistoryRequest,
+    UpdateChatHistoryRequest,
+    AppendChatMessagesRequest,
+    AppendChatMessagesResponse,
+    ChatMessagesPageSchema
+)
+from pagination import build_projection
+from repositories import get_chat_history_repository
 
 router = APIRouter(prefix="/api/chat-history", tags=["Chat History"])
 
+HISTORY_FIELDS = list(ChatHistorySchema.model_fields)
+HISTORY_REQUIRED_FIELDS = ["id", "userId", "created_at", "updated_at"]
+
 @router.get("/", response_model=List[ChatHistorySchema])
-async def get_chat_histories(userId: str = None):
-    """Get all chat histories, optionally filtered by userId"""
-    db = get_database()
-    if not db:
-        return []
-    
-    collection = db.chat_histories
+async def get_chat_histories(
+    response: Response,
+    userId: str = None,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Get chat histories newest first, optionally filtered by userId.
+    Messages are left out unless requested via fields=; the X-Next-Cursor
+    response header holds the cursor for the next page."""
     query = {"userId": userId} if userId else {}
-    histories = await collection.find(query).to_list(100)
+    projection = build_projection(fields, HISTORY_FIELDS, HISTORY_REQUIRED_FIELDS, ["messages"])
+    histories, next_cursor = await get_chat_history_repository().list(
+        query, "created_at", limit, cursor, projection
+    )
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return [ChatHistorySchema(**history) for history in histories]
 
@@ -30,30 +50,19 @@ async def create_chat_history(request: CreateChatHistoryRequest):
         "id": history_id,
         "userId": request.userId,
         "projectId": request.projectId,
-        "messages": request.messages,
+        "messageCount": len(request.messages),
         "created_at": created_at,
         "updated_at": created_at
     }
     
-    db = get_database()
-    if db:
-        collection = db.chat_histories
-        await collection.insert_one(history_dict)
+    await get_chat_history_repository().create(history_dict, request.messages)
     
-    return ChatHistorySchema(**history_dict)
+    return ChatHistorySchema(**history_dict, messages=request.messages)
 
 @router.get("/{history_id}", response_model=ChatHistorySchema)
 async def get_chat_history(history_id: str):
     """Get a specific chat history by ID"""
-    db = get_database()
-    if not db:
-        raise HTTPException(
-            status_code=404, 
-            detail="Chat history not found. Database is not connected."
-        )
-    
-    collection = db.chat_histories
-    history = await collection.find_one({"id": history_id})
+    history = await get_chat_history_repository().get(history_id)
     
     if not history:
         raise HTTPException(status_code=404, detail="Chat history not found")
@@ -63,56 +72,74 @@ async def get_chat_history(history_id: str):
 @router.put("/{history_id}", response_model=ChatHistorySchema)
 async def update_chat_history(history_id: str, request: UpdateChatHistoryRequest):
     """Update an existing chat history"""
-    db = get_database()
-    if not db:
-        raise HTTPException(
-            status_code=404,
-            detail="Chat history not found. Database is not connected."
-        )
-    
-    collection = db.chat_histories
-    history = await collection.find_one({"id": history_id})
+    history = await get_chat_history_repository().replace_messages(
+        history_id, request.messages, datetime.utcnow().isoformat()
+    )
     
     if not history:
         raise HTTPException(status_code=404, detail="Chat history not found")
     
-    updated_at = datetime.utcnow().isoformat()
-    await collection.update_one(
-        {"id": history_id},
-        {"$set": {"messages": request.messages, "updated_at": updated_at}}
+    return ChatHistorySchema(**history)
+
+@router.post("/{history_id}/messages", response_model=AppendChatMessagesResponse)
+async def append_chat_messages(history_id: str, request: AppendChatMessagesRequest):
+    """Append messages atomically; concurrent appends never overwrite each other"""
+    history = await get_chat_history_repository().append(
+        history_id, request.messages, datetime.utcnow().isoformat()
     )
+    if not history:
+        raise HTTPException(status_code=404, detail="Chat history not found")
     
-    history["messages"] = request.messages
-    history["updated_at"] = updated_at
+    return AppendChatMessagesResponse(
+        historyId=history_id,
+        messageCount=history["messageCount"],
+        updated_at=history["updated_at"]
+    )
+
+@router.get("/{history_id}/messages", response_model=ChatMessagesPageSchema)
+async def get_chat_messages(
+    history_id: str,
+    before: Optional[int] = Query(None, ge=1),
+    limit: int = Query(50, ge=1, le=200)
+):
+    """Page through messages oldest-to-newest within a page, newest page first.
+    before= is a message index; the response's nextBefore continues backwards."""
+    page = await get_chat_history_repository().read_page(history_id, before, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Chat history not found")
     
-    return ChatHistorySchema(**history)
+    messages, start, count = page
+    return ChatMessagesPageSchema(
+        historyId=history_id,
+        messages=messages,
+        messageCount=count,
+        nextBefore=start if start > 0 else None
+    )
 
 @router.delete("/{history_id}")
 async def delete_chat_history(history_id: str):
     """Delete a chat history"""
-    db = get_database()
-    if not db:
-        raise HTTPException(
-            status_code=404,
-            detail="Chat history not found. Database is not connected."
-        )
-    
-    collection = db.chat_histories
-    result = await collection.delete_one({"id": history_id})
-    
-    if result.deleted_count == 0:
+    if not await get_chat_history_repository().delete(history_id):
         raise HTTPException(status_code=404, detail="Chat history not found")
     
     return {"message": "Chat history deleted successfully"}
 
 @router.get("/user/{userId}/project/{projectId}", response_model=List[ChatHistorySchema])
-async def get_user_project_chat_histories(userId: str, projectId: str):
-    """Get all chat histories for a specific user and project"""
-    db = get_database()
-    if not db:
-        return []
+async def get_user_project_chat_histories(
+    userId: str,
+    projectId: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Get chat histories for a specific user and project, most recently updated first"""
+    projection = build_projection(fields, HISTORY_FIELDS, HISTORY_REQUIRED_FIELDS, ["messages"])
+    histories, next_cursor = await get_chat_history_repository().list(
+        {"userId": userId, "projectId": projectId}, "updated_at", limit, cursor, projection
+    )
     
-    collection = db.chat_histories
-    histories = await collection.find({"userId": userId, "projectId": projectId}).to_list(100)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return [ChatHistorySchema(**history) for history in histories]
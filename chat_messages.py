@@ -0,0 +1,160 @@
+import os
+from typing import Optional, Dict, Any, List, Tuple
+from pymongo import ReturnDocument, UpdateOne, ReplaceOne
+
+CHAT_BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", "100"))
+
+# Chat messages live in `chat_message_buckets`, CHAT_BUCKET_SIZE per document:
+# message number n is in bucket n // CHAT_BUCKET_SIZE, stored as
+# {"seq": n, "message": {...}}. The `chat_histories` document is only a head
+# with metadata and messageCount. Appends reserve sequence numbers on the head
+# with $inc and then $push into the buckets sorted by seq, so concurrent
+# appends interleave correctly. Heads that still carry an inline `messages`
+# array are legacy documents and are moved into buckets on first write.
+
+def bucket_writes(history_id: str, start: int, messages: List[Dict[str, Any]]) -> List[UpdateOne]:
+    """Bulk operations pushing `messages`, numbered from `start`, into their buckets"""
+    buckets: Dict[int, List[Dict[str, Any]]] = {}
+    for offset, message in enumerate(messages):
+        seq = start + offset
+        buckets.setdefault(seq // CHAT_BUCKET_SIZE, []).append({"seq": seq, "message": message})
+
+    return [
+        UpdateOne(
+            {"historyId": history_id, "bucket": bucket},
+            {
+                "$push": {"messages": {"$each": items, "$sort": {"seq": 1}}},
+                "$inc": {"count": len(items)}
+            },
+            upsert=True
+        )
+        for bucket, items in buckets.items()
+    ]
+
+def bucket_documents(history_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "historyId": history_id,
+            "bucket": start // CHAT_BUCKET_SIZE,
+            "messages": [
+                {"seq": start + offset, "message": message}
+                for offset, message in enumerate(messages[start:start + CHAT_BUCKET_SIZE])
+            ],
+            "count": len(messages[start:start + CHAT_BUCKET_SIZE])
+        }
+        for start in range(0, len(messages), CHAT_BUCKET_SIZE)
+    ]
+
+async def write_messages(db, history_id: str, start: int, messages: List[Dict[str, Any]]):
+    operations = bucket_writes(history_id, start, messages)
+    if operations:
+        await db.chat_message_buckets.bulk_write(operations, ordered=False)
+
+async def replace_messages(db, history_id: str, messages: List[Dict[str, Any]]):
+    """Replace the whole message list of a history"""
+    await db.chat_message_buckets.delete_many({"historyId": history_id})
+    await write_messages(db, history_id, 0, messages)
+
+async def delete_messages(db, history_id: str):
+    await db.chat_message_buckets.delete_many({"historyId": history_id})
+
+async def read_messages(db, history_id: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Messages with start <= seq < end, reading only the buckets that hold them"""
+    if end <= start:
+        return []
+
+    query = {
+        "historyId": history_id,
+        "bucket": {"$gte": start // CHAT_BUCKET_SIZE, "$lte": (end - 1) // CHAT_BUCKET_SIZE}
+    }
+    messages = []
+    async for bucket in db.chat_message_buckets.find(query, {"messages": 1}).sort("bucket", 1):
+        messages.extend(item["message"] for item in bucket["messages"] if start <= item["seq"] < end)
+    return messages
+
+async def read_all_messages(db, history_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Full message lists of several histories in one query"""
+    messages: Dict[str, List[Dict[str, Any]]] = {history_id: [] for history_id in history_ids}
+    cursor = db.chat_message_buckets.find(
+        {"historyId": {"$in": history_ids}},
+        {"historyId": 1, "messages": 1}
+    ).sort([("historyId", 1), ("bucket", 1)])
+    async for bucket in cursor:
+        messages[bucket["historyId"]].extend(item["message"] for item in bucket["messages"])
+    return messages
+
+async def attach_messages(db, histories: List[Dict[str, Any]]):
+    """Fill in `messages` on head documents; legacy documents already have them"""
+    bucketed = [history for history in histories if "messages" not in history]
+    if not bucketed:
+        return
+
+    messages = await read_all_messages(db, [history["id"] for history in bucketed])
+    for history in bucketed:
+        history["messages"] = messages[history["id"]]
+
+async def migrate_history(db, history_id: str) -> bool:
+    """Move a legacy inline `messages` array into buckets; False if there was
+    nothing to migrate. Safe to run concurrently for the same history."""
+    while True:
+        history = await db.chat_histories.find_one(
+            {"id": history_id, "messages": {"$exists": True}},
+            {"messages": 1}
+        )
+        if not history:
+            return False
+
+        messages = history.get("messages") or []
+        documents = bucket_documents(history_id, messages)
+        # Whole-bucket replaces are idempotent, so a concurrent migration of
+        # the same history writes identical documents.
+        if documents:
+            await db.chat_message_buckets.bulk_write(
+                [
+                    ReplaceOne({"historyId": history_id, "bucket": document["bucket"]}, document, upsert=True)
+                    for document in documents
+                ],
+                ordered=False
+            )
+
+        # The head only switches over if nobody appended to the inline array
+        # meanwhile; otherwise migrate again from the new contents.
+        result = await db.chat_histories.update_one(
+            {"id": history_id, "messages": messages},
+            {"$unset": {"messages": ""}, "$set": {"messageCount": len(messages)}}
+        )
+        if result.modified_count:
+            return True
+
+async def append_messages(db, history_id: str, messages: List[Dict[str, Any]], updated_at: str) -> Optional[Dict[str, Any]]:
+    """Append messages and return the updated head, or None if the history does not exist"""
+    await migrate_history(db, history_id)
+    head = await db.chat_histories.find_one_and_update(
+        {"id": history_id},
+        {"$inc": {"messageCount": len(messages)}, "$set": {"updated_at": updated_at}},
+        projection={"id": 1, "userId": 1, "projectId": 1, "messageCount": 1, "updated_at": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not head:
+        return None
+
+    await write_messages(db, history_id, head["messageCount"] - len(messages), messages)
+    return head
+
+async def read_page(db, history_id: str, before: Optional[int], limit: int) -> Optional[Tuple[List[Dict[str, Any]], int, int]]:
+    """(messages, first seq, messageCount) for the page ending at `before`
+    (or at the newest message), or None if the history does not exist"""
+    head = await db.chat_histories.find_one({"id": history_id}, {"messageCount": 1, "messages": 1})
+    if not head:
+        return None
+
+    if "messages" in head:
+        count = len(head["messages"])
+    else:
+        count = head.get("messageCount", 0)
+    end = count if before is None else min(before, count)
+    start = max(0, end - limit)
+
+    if "messages" in head:
+        return head["messages"][start:end], start, count
+    return await read_messages(db, history_id, start, end), start, count
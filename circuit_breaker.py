@@ -0,0 +1,95 @@
+import os
+import time
+from typing import Dict, Any, Optional
+
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "3"))
+LLM_BREAKER_BASE_BACKOFF = float(os.getenv("LLM_BREAKER_BASE_BACKOFF", "5"))
+LLM_BREAKER_MAX_BACKOFF = float(os.getenv("LLM_BREAKER_MAX_BACKOFF", "300"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Per-provider circuit breaker.
+    
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for a backoff period. Once that elapses a single probe is
+    let through (half-open): success closes the breaker, failure reopens it
+    with the backoff doubled up to `max_backoff`.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+        base_backoff: float = LLM_BREAKER_BASE_BACKOFF,
+        max_backoff: float = LLM_BREAKER_MAX_BACKOFF
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.backoff = base_backoff
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.trips = 0
+        self.last_error: Optional[str] = None
+    
+    def ready(self) -> bool:
+        """Whether a call would be let through, without claiming anything"""
+        if self.state == CLOSED:
+            return True
+        if self.probe_in_flight:
+            return False
+        return time.monotonic() >= self.open_until
+    
+    def allows(self) -> bool:
+        """Let a call through, claiming the half-open probe if this call is
+        it. Call right before the provider call: check and claim happen with
+        no await in between, so concurrent callers never get two probes."""
+        if not self.ready():
+            return False
+        if self.state != CLOSED:
+            self.state = HALF_OPEN
+            self.probe_in_flight = True
+        return True
+    
+    def on_cancel(self):
+        self.probe_in_flight = False
+    
+    def record_success(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.backoff = self.base_backoff
+        self.probe_in_flight = False
+    
+    def record_failure(self, error: Optional[str] = None):
+        self.last_error = error
+        self.consecutive_failures += 1
+        
+        if self.state == HALF_OPEN:
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            self._trip()
+        elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self.backoff = self.base_backoff
+            self._trip()
+        self.probe_in_flight = False
+    
+    def _trip(self):
+        self.state = OPEN
+        self.open_until = time.monotonic() + self.backoff
+        self.trips += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = max(0.0, self.open_until - time.monotonic()) if self.state != CLOSED else 0.0
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "backoff_seconds": self.backoff,
+            "retry_in_seconds": round(retry_in, 1),
+            "last_error": self.last_error
+        }
@@ -0,0 +1,186 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+LLM_HISTORY_TOKEN_BUDGET = int(os.getenv("LLM_HISTORY_TOKEN_BUDGET", "3000"))
+LLM_COMPACTION_BLOCK_SIZE = int(os.getenv("LLM_COMPACTION_BLOCK_SIZE", "10"))
+LLM_SUMMARY_CACHE_SIZE = int(os.getenv("LLM_SUMMARY_CACHE_SIZE", "1024"))
+LLM_TRUNCATED_TURN_CHARS = int(os.getenv("LLM_TRUNCATED_TURN_CHARS", "200"))
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) for providers that don't report usage"""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    # ~4 tokens of per-message framing on chat-completion APIs
+    return sum(estimate_tokens(message.get("content", "")) + 4 for message in messages)
+
+def build_messages(
+    prompt: str,
+    system: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None
+) -> List[Dict[str, str]]:
+    """Order messages so the fixed parts (system, then compacted history)
+    form a stable prefix that provider-side prompt caches can reuse."""
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
+    for turn in history or []:
+        messages.append({"role": turn.get("role", "user"), "content": turn.get("content", "")})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+def to_gemini_contents(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Convert chat messages to Gemini contents.
+    
+    Gemini has no system role in this SDK version, so system text is folded
+    into the next user turn; consecutive turns from the same side are merged
+    because Gemini expects user/model turns to alternate.
+    """
+    contents: List[Dict[str, Any]] = []
+    pending_system: List[str] = []
+    for message in messages:
+        role = message.get("role", "user")
+        text = message.get("content", "")
+        if role == "system":
+            pending_system.append(text)
+            continue
+        
+        gemini_role = "model" if role == "assistant" else "user"
+        if gemini_role == "user" and pending_system:
+            text = "\n\n".join(pending_system + [text])
+            pending_system = []
+        
+        if contents and contents[-1]["role"] == gemini_role:
+            contents[-1]["parts"].append(text)
+        else:
+            contents.append({"role": gemini_role, "parts": [text]})
+    
+    if pending_system:
+        contents.append({"role": "user", "parts": ["\n\n".join(pending_system)]})
+    return contents
+
+def truncate_turns(turns: List[Dict[str, str]]) -> str:
+    lines = []
+    for turn in turns:
+        content = " ".join(turn.get("content", "").split())
+        if len(content) > LLM_TRUNCATED_TURN_CHARS:
+            content = content[:LLM_TRUNCATED_TURN_CHARS] + "…"
+        lines.append(f"{turn.get('role', 'user')}: {content}")
+    return "\n".join(lines)
+
+def summary_message(summaries: List[str]) -> Dict[str, str]:
+    return {"role": "system", "content": SUMMARY_PREFIX + "\n\n".join(summaries)}
+
+def truncate_message(message: Dict[str, str], token_budget: int) -> Dict[str, str]:
+    """Cut a message's content so the message fits in `token_budget`"""
+    max_chars = max(0, (token_budget - 4) * 4 - 1)
+    content = message.get("content", "")
+    if len(content) > max_chars:
+        content = content[:max_chars] + "…"
+    return {**message, "content": content}
+
+class HistoryCompactor:
+    """Keeps chat history within a token budget.
+    
+    Recent turns are kept verbatim. Older turns are summarized in fixed
+    blocks counted from the start of the conversation, so a block's summary
+    doesn't change as the conversation grows. That keeps the prompt prefix
+    byte-identical between turns (good for provider prompt caches) and lets
+    summaries be cached by block content.
+    """
+    
+    def __init__(
+        self,
+        summarize: Optional[Callable[[List[Dict[str, str]]], Awaitable[str]]] = None,
+        token_budget: int = LLM_HISTORY_TOKEN_BUDGET,
+        block_size: int = LLM_COMPACTION_BLOCK_SIZE,
+        cache_size: int = LLM_SUMMARY_CACHE_SIZE
+    ):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.block_size = block_size
+        self.cache_size = cache_size
+        self.summaries: "OrderedDict[str, str]" = OrderedDict()
+        self.stats = {"compactions": 0, "summary_hits": 0, "summary_misses": 0}
+    
+    async def _summarize_block(self, block: List[Dict[str, str]]) -> str:
+        key = hashlib.sha256(json.dumps(block, sort_keys=True).encode()).hexdigest()
+        if key in self.summaries:
+            self.summaries.move_to_end(key)
+            self.stats["summary_hits"] += 1
+            return self.summaries[key]
+        
+        self.stats["summary_misses"] += 1
+        summary = None
+        if self.summarize:
+            try:
+                summary = await self.summarize(block)
+            except Exception:
+                summary = None
+        summary = summary or truncate_turns(block)
+        
+        self.summaries[key] = summary
+        while len(self.summaries) > self.cache_size:
+            self.summaries.popitem(last=False)
+        return summary
+    
+    async def compact(
+        self,
+        history: List[Dict[str, str]],
+        token_budget: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        budget = token_budget or self.token_budget
+        if count_message_tokens(history) <= budget:
+            return history
+        
+        self.stats["compactions"] += 1
+        
+        # Keep as many recent turns verbatim as fit in half the budget, then
+        # round the split down to a block boundary so blocks stay stable.
+        recent_tokens = 0
+        split = len(history)
+        while split > 0:
+            cost = count_message_tokens([history[split - 1]])
+            if recent_tokens + cost > budget // 2:
+                break
+            recent_tokens += cost
+            split -= 1
+        split = (split // self.block_size) * self.block_size
+        while (
+            split + self.block_size < len(history)
+            and count_message_tokens(history[split:]) > budget * 3 // 4
+        ):
+            split += self.block_size
+        
+        summaries = [
+            await self._summarize_block(history[start:start + self.block_size])
+            for start in range(0, split, self.block_size)
+        ]
+        recent = list(history[split:])
+        
+        # A few very long turns can exceed the budget on their own (also in
+        # histories shorter than a block): fold the oldest verbatim turns
+        # into the summary in truncated form until the rest fits.
+        while len(recent) > 1 and count_message_tokens(recent) > budget:
+            summaries.append(truncate_turns([recent.pop(0)]))
+        if recent and count_message_tokens(recent) > budget:
+            recent = [truncate_message(recent[0], budget)] if budget > 4 else []
+        
+        # Drop the oldest summaries if everything still doesn't fit.
+        available = budget - count_message_tokens(recent)
+        while summaries and count_message_tokens([summary_message(summaries)]) > available:
+            summaries.pop(0)
+        
+        if not summaries:
+            return recent
+        return [summary_message(summaries)] + recent
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "cached_summaries": len(self.summaries)}
@@ -1,17 +1,109 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from typing import Optional, Dict, List
+import asyncio
 import os
 
+MONGO_INDEX_TIMEOUT = float(os.getenv("MONGO_INDEX_TIMEOUT", "10"))
+
+# Every index the route layer relies on, keyed by collection. Created (and
+# verified) at startup so hot lookups never fall back to collection scans.
+REQUIRED_INDEXES: Dict[str, List[IndexModel]] = {
+    "projects": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("userId", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="userId_created_at_id"
+        )
+    ],
+    "chat_histories": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("userId", ASCENDING), ("projectId", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)],
+            name="userId_projectId_updated_at_id"
+        ),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("userId", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="userId_created_at_id"
+        )
+    ],
+    "chat_message_buckets": [
+        IndexModel([("historyId", ASCENDING), ("bucket", ASCENDING)], name="historyId_bucket", unique=True)
+    ],
+    "search_documents": [
+        IndexModel([("userId", ASCENDING), ("text", TEXT)], name="userId_text"),
+        IndexModel([("historyId", ASCENDING)], name="historyId", sparse=True),
+        IndexModel([("projectId", ASCENDING)], name="projectId", sparse=True)
+    ],
+    "github_sync_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("projectId", ASCENDING)],
+            name="projectId_active_unique",
+            unique=True,
+            partialFilterExpression={"active": True}
+        )
+    ],
+    "project_versions": [
+        IndexModel([("projectId", ASCENDING), ("version", DESCENDING)], name="projectId_version", unique=True)
+    ],
+    "llm_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0)
+    ],
+    "usage_records": [
+        IndexModel([("userId", ASCENDING), ("created_at", ASCENDING)], name="userId_created_at")
+    ],
+    "usage_daily": [
+        IndexModel(
+            [("userId", ASCENDING), ("day", ASCENDING), ("provider", ASCENDING), ("model", ASCENDING)],
+            name="userId_day_provider_model",
+            unique=True
+        ),
+        IndexModel([("day", ASCENDING)], name="day")
+    ]
+}
+
 class MongoDB:
     client: Optional[AsyncIOMotorClient] = None
     db = None
 
 mongodb = MongoDB()
 
+async def ensure_indexes(db):
+    for collection, indexes in REQUIRED_INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+async def verify_indexes(db) -> Dict[str, List[str]]:
+    """Names of required indexes that are missing, keyed by collection"""
+    missing = {}
+    for collection, indexes in REQUIRED_INDEXES.items():
+        existing = await db[collection].index_information()
+        names = [index.document["name"] for index in indexes if index.document["name"] not in existing]
+        if names:
+            missing[collection] = names
+    return missing
+
 async def connect_to_mongo():
-    mongodb.client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    mongo_url = os.getenv("MONGO_URL")
+    if not mongo_url:
+        print("MONGO_URL not set; projects and chat histories use local SQLite storage")
+        return
+    
+    mongodb.client = AsyncIOMotorClient(mongo_url)
     mongodb.db = mongodb.client[os.getenv("DB_NAME", "doveable_ai")]
     print("Connected to MongoDB")
+    
+    try:
+        await asyncio.wait_for(ensure_indexes(mongodb.db), timeout=MONGO_INDEX_TIMEOUT)
+        missing = await asyncio.wait_for(verify_indexes(mongodb.db), timeout=MONGO_INDEX_TIMEOUT)
+        if missing:
+            print(f"Missing MongoDB indexes: {missing}")
+        else:
+            print("MongoDB indexes verified")
+    except Exception as e:
+        print(f"Could not ensure MongoDB indexes: {e}")
 
 async def close_mongo_connection():
     if mongodb.client:
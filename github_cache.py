@@ -0,0 +1,138 @@
+import os
+import time
+import asyncio
+import hashlib
+import httpx
+from collections import OrderedDict
+from fastapi import HTTPException
+from typing import Optional, Dict, Any, Tuple
+
+GITHUB_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", "1000"))
+GITHUB_CACHE_MAX_BYTES = int(os.getenv("GITHUB_CACHE_MAX_BYTES", "1048576"))
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "50"))
+GITHUB_RATE_LIMIT_MAX_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "5"))
+
+CACHED_HEADERS = ("content-type", "etag", "link")
+
+# GitHub GETs are sent with If-None-Match when an earlier response for the
+# same token and URL had an ETag. A 304 does not count against the rate
+# limit, so repeated /user and /user/repos lookups become free. The
+# X-RateLimit-Remaining/Reset headers are tracked per token, and calls are
+# held back (or refused with 429) before GitHub starts rejecting them.
+
+def token_key(request: httpx.Request) -> Optional[str]:
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()[:32]
+
+class GitHubResponseCache:
+    """Per-token LRU of GitHub GET responses keyed by URL, plus the last
+    rate-limit state seen for each token"""
+
+    def __init__(
+        self,
+        max_entries: int = GITHUB_CACHE_MAX_ENTRIES,
+        max_bytes: int = GITHUB_CACHE_MAX_BYTES,
+        reserve: int = GITHUB_RATE_LIMIT_RESERVE,
+        max_wait: float = GITHUB_RATE_LIMIT_MAX_WAIT
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[str, Dict[str, str], bytes]]" = OrderedDict()
+        self.rate_limits: Dict[str, Tuple[int, float]] = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "throttled": 0, "refused": 0}
+
+    async def get(
+        self,
+        client: httpx.AsyncClient,
+        path: str,
+        headers: Dict[str, str],
+        params: Optional[Dict[str, Any]] = None
+    ) -> httpx.Response:
+        """GET through the cache; a 304 is answered with the cached 200"""
+        request = client.build_request("GET", path, headers=headers, params=params)
+        key = (token_key(request) or "", str(request.url))
+        entry = self.entries.get(key)
+        if entry:
+            request.headers["If-None-Match"] = entry[0]
+
+        response = await client.send(request)
+        if response.status_code == 304 and entry:
+            # The entry may have been evicted while the request was in
+            # flight; the local copy is still valid, so put it back.
+            self.store(key, entry)
+            self.stats["hits"] += 1
+            _, cached_headers, content = entry
+            return httpx.Response(200, headers=cached_headers, content=content, request=request)
+
+        self.stats["misses"] += 1
+        etag = response.headers.get("etag")
+        if response.status_code == 200 and etag and len(response.content) <= self.max_bytes:
+            cached_headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+            self.store(key, (etag, cached_headers, response.content))
+        elif entry and response.status_code in (401, 404):
+            self.entries.pop(key, None)
+        return response
+
+    def store(self, key: Tuple[str, str], entry: Tuple[str, Dict[str, str], bytes]):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def throttle(self, request: httpx.Request):
+        """Request hook: wait for, or refuse, calls that would run into the
+        token's rate limit"""
+        key = token_key(request)
+        if key not in self.rate_limits:
+            return
+
+        remaining, reset = self.rate_limits[key]
+        wait = reset - time.time()
+        if wait <= 0:
+            del self.rate_limits[key]
+            return
+        # Count the call now, so concurrent requests see each other.
+        self.rate_limits[key] = (remaining - 1, reset)
+        # A conditional GET that comes back 304 is free.
+        if remaining > self.reserve or ("if-none-match" in request.headers and remaining > 0):
+            return
+
+        if wait > self.max_wait:
+            self.stats["refused"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail=f"GitHub rate limit nearly used up; try again in {int(wait) + 1} seconds"
+            )
+        self.stats["throttled"] += 1
+        await asyncio.sleep(wait)
+
+    async def record_rate_limit(self, response: httpx.Response):
+        """Response hook: remember the token's remaining calls and reset time"""
+        key = token_key(response.request)
+        remaining = response.headers.get("x-ratelimit-remaining")
+        reset = response.headers.get("x-ratelimit-reset")
+        if not key or remaining is None or reset is None:
+            return
+        try:
+            self.rate_limits[key] = (int(remaining), float(reset))
+        except ValueError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        now = time.time()
+        limits = [remaining for remaining, reset in self.rate_limits.values() if reset > now]
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "tracked_tokens": len(limits),
+            "lowest_remaining": min(limits) if limits else None
+        }
+
+github_cache = GitHubResponseCache()
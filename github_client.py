@@ -0,0 +1,208 @@
+import os
+import base64
+import asyncio
+import hashlib
+import httpx
+from fastapi import HTTPException
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from http_client import outbound_http
+from github_cache import github_cache
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_BLOB_CONCURRENCY = int(os.getenv("GITHUB_BLOB_CONCURRENCY", "8"))
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "30"))
+
+# Pushes go through the Git Data API: every file becomes a blob (created
+# concurrently, at most GITHUB_BLOB_CONCURRENCY at a time), then one tree,
+# one commit and a fast-forward of the branch ref. A sync is therefore a
+# single commit and O(files / concurrency) round trips instead of two
+# sequential calls per file. GITHUB_API_URL can point at a fake server.
+
+def git_blob_sha(data: bytes) -> str:
+    """The SHA-1 git assigns to a blob with this content"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def github_client() -> httpx.AsyncClient:
+    """The shared pooled client for the GitHub API; do not close it"""
+    return outbound_http.client(
+        GITHUB_API_URL,
+        GITHUB_TIMEOUT,
+        event_hooks={"request": [github_cache.throttle], "response": [github_cache.record_rate_limit]}
+    )
+
+def github_headers(access_token: str) -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {access_token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+async def github_get(
+    client: httpx.AsyncClient,
+    path: str,
+    access_token: str,
+    params: Optional[Dict[str, Any]] = None
+) -> httpx.Response:
+    """Conditional GET, answered from the ETag cache when unchanged"""
+    return await github_cache.get(client, path, github_headers(access_token), params)
+
+async def github_request(
+    client: httpx.AsyncClient,
+    method: str,
+    path: str,
+    access_token: str,
+    error: str,
+    **kwargs
+) -> Dict[str, Any]:
+    if method == "GET":
+        response = await github_get(client, path, access_token, kwargs.get("params"))
+    else:
+        response = await client.request(method, path, headers=github_headers(access_token), **kwargs)
+    if response.status_code >= 400:
+        try:
+            message = response.json().get("message", error)
+        except ValueError:
+            message = error
+        raise HTTPException(status_code=response.status_code, detail=message)
+    return response.json()
+
+async def get_github_login(client: httpx.AsyncClient, access_token: str) -> str:
+    response = await github_get(client, "/user", access_token)
+    if response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Invalid GitHub access token")
+    return response.json().get("login")
+
+async def create_github_repo(
+    client: httpx.AsyncClient,
+    access_token: str,
+    repo_name: str,
+    description: str,
+    is_private: bool
+) -> Dict[str, Any]:
+    """Create a new GitHub repository with an initial commit to build on"""
+    return await github_request(
+        client, "POST", "/user/repos", access_token, "Failed to create repository",
+        json={
+            "name": repo_name,
+            "description": description,
+            "private": is_private,
+            "auto_init": True
+        }
+    )
+
+async def get_default_branch(client: httpx.AsyncClient, access_token: str, owner: str, repo: str) -> str:
+    data = await github_request(client, "GET", f"/repos/{owner}/{repo}", access_token, "Repository not found")
+    return data.get("default_branch", "main")
+
+async def get_branch_head(
+    client: httpx.AsyncClient,
+    access_token: str,
+    owner: str,
+    repo: str,
+    branch: str
+) -> Tuple[str, str]:
+    """(commit sha, tree sha) at the tip of `branch`"""
+    # A repository created a moment ago may not have its initial commit yet.
+    for attempt in range(3):
+        response = await github_get(client, f"/repos/{owner}/{repo}/git/ref/heads/{branch}", access_token)
+        if response.status_code not in (404, 409) or attempt == 2:
+            break
+        await asyncio.sleep(1 + attempt)
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f"Branch {branch} not found")
+
+    commit_sha = response.json()["object"]["sha"]
+    commit = await github_request(
+        client, "GET", f"/repos/{owner}/{repo}/git/commits/{commit_sha}", access_token, "Commit not found"
+    )
+    return commit_sha, commit["tree"]["sha"]
+
+async def create_blobs(
+    client: httpx.AsyncClient,
+    access_token: str,
+    owner: str,
+    repo: str,
+    contents: Dict[str, bytes],
+    on_uploaded: Optional[Callable[[str], None]] = None
+) -> Dict[str, str]:
+    """Upload file contents concurrently; returns path -> blob sha.
+    `on_uploaded` is called with each path as its blob is created."""
+    semaphore = asyncio.Semaphore(GITHUB_BLOB_CONCURRENCY)
+
+    async def create_blob(path: str, data: bytes) -> Tuple[str, str]:
+        async with semaphore:
+            blob = await github_request(
+                client, "POST", f"/repos/{owner}/{repo}/git/blobs", access_token,
+                f"Failed to upload {path}",
+                json={"content": base64.b64encode(data).decode(), "encoding": "base64"}
+            )
+        if on_uploaded:
+            on_uploaded(path)
+        return path, blob["sha"]
+
+    return dict(await asyncio.gather(*(create_blob(path, data) for path, data in contents.items())))
+
+async def commit_tree(
+    client: httpx.AsyncClient,
+    access_token: str,
+    owner: str,
+    repo: str,
+    branch: str,
+    entries: List[Dict[str, Any]],
+    message: str,
+    parent_sha: str,
+    base_tree: Optional[str]
+) -> str:
+    """Create a tree from `entries` on top of `base_tree`, commit it and move
+    `branch` to the new commit; returns the commit sha"""
+    tree_request: Dict[str, Any] = {"tree": entries}
+    if base_tree:
+        tree_request["base_tree"] = base_tree
+    tree = await github_request(
+        client, "POST", f"/repos/{owner}/{repo}/git/trees", access_token, "Failed to create tree",
+        json=tree_request
+    )
+    commit = await github_request(
+        client, "POST", f"/repos/{owner}/{repo}/git/commits", access_token, "Failed to create commit",
+        json={"message": message, "tree": tree["sha"], "parents": [parent_sha]}
+    )
+    # Not forced: if the branch moved since parent_sha was read, GitHub
+    # rejects the update instead of discarding someone else's commit.
+    await github_request(
+        client, "PATCH", f"/repos/{owner}/{repo}/git/refs/heads/{branch}", access_token,
+        "Failed to update branch",
+        json={"sha": commit["sha"], "force": False}
+    )
+    return commit["sha"]
+
+async def push_files(
+    client: httpx.AsyncClient,
+    access_token: str,
+    owner: str,
+    repo: str,
+    branch: str,
+    contents: Dict[str, bytes],
+    message: str,
+    deleted: Optional[List[str]] = None,
+    expected_head: Optional[str] = None,
+    on_uploaded: Optional[Callable[[str], None]] = None
+) -> str:
+    """Write `contents` (path -> bytes) to `branch` and remove `deleted`
+    paths as a single commit. With `expected_head`, refuse (409) if the
+    branch no longer points at that commit."""
+    parent_sha, base_tree = await get_branch_head(client, access_token, owner, repo, branch)
+    if expected_head and parent_sha != expected_head:
+        raise HTTPException(
+            status_code=409,
+            detail=f"{owner}/{repo} has commits that were not made by this project's sync"
+        )
+
+    blobs = await create_blobs(client, access_token, owner, repo, contents, on_uploaded)
+    entries = [
+        {"path": path, "mode": "100644", "type": "blob", "sha": sha}
+        for path, sha in blobs.items()
+    ]
+    entries.extend(
+        {"path": path, "mode": "100644", "type": "blob", "sha": None}
+        for path in deleted or []
+    )
+    return await commit_tree(client, access_token, owner, repo, branch, entries, message, parent_sha, base_tree)
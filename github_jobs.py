@@ -0,0 +1,249 @@
+import os
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from typing import Optional, Dict, Any, Tuple
+from database import get_database
+from github_sync import SyncProgress, sync_new_repo, update_repo
+
+GITHUB_SYNC_CONCURRENCY = int(os.getenv("GITHUB_SYNC_CONCURRENCY", "4"))
+GITHUB_SYNC_USER_CONCURRENCY = int(os.getenv("GITHUB_SYNC_USER_CONCURRENCY", "1"))
+GITHUB_SYNC_PROGRESS_INTERVAL = float(os.getenv("GITHUB_SYNC_PROGRESS_INTERVAL", "0.5"))
+GITHUB_SYNC_HEARTBEAT_INTERVAL = float(os.getenv("GITHUB_SYNC_HEARTBEAT_INTERVAL", "10"))
+GITHUB_SYNC_STALE_AFTER = float(os.getenv("GITHUB_SYNC_STALE_AFTER", "60"))
+
+INTERRUPTED_MESSAGE = "Interrupted by a server restart; start the sync again"
+INTERNAL_FIELDS = ("_id", "active", "workerId", "heartbeat_at")
+
+# Syncs run as background jobs recorded in `github_sync_jobs`. A job is
+# `active` while queued or running, and a partial unique index allows one
+# active job per project, so a retried request gets the job already in
+# flight instead of a second push. Access tokens are only held in memory,
+# never stored, so a job cannot be resumed by another process. Each process
+# stamps `heartbeat_at` on the active jobs it owns (`workerId`) every
+# GITHUB_SYNC_HEARTBEAT_INTERVAL seconds; active jobs whose heartbeat is
+# older than GITHUB_SYNC_STALE_AFTER belong to a process that died and are
+# marked failed by whichever process notices first. Jobs of live workers
+# are left alone.
+
+def job_user_key(project: Dict[str, Any], access_token: str) -> str:
+    if project.get("userId"):
+        return project["userId"]
+    return "token:" + hashlib.sha256(access_token.encode()).hexdigest()[:16]
+
+def job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in job.items() if key not in INTERNAL_FIELDS}
+
+class GitHubSyncJobs:
+    """Runs sync jobs with at most `concurrency` pushes at once overall and
+    `user_concurrency` per user; excess jobs wait in the queued state."""
+
+    def __init__(
+        self,
+        concurrency: int = GITHUB_SYNC_CONCURRENCY,
+        user_concurrency: int = GITHUB_SYNC_USER_CONCURRENCY,
+        progress_interval: float = GITHUB_SYNC_PROGRESS_INTERVAL,
+        heartbeat_interval: float = GITHUB_SYNC_HEARTBEAT_INTERVAL,
+        stale_after: float = GITHUB_SYNC_STALE_AFTER
+    ):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.user_concurrency = user_concurrency
+        self.progress_interval = progress_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.user_semaphores: Dict[str, Tuple[asyncio.Semaphore, int]] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.progress: Dict[str, SyncProgress] = {}
+        self.worker_id = str(uuid.uuid4())
+        self.heartbeat: Optional[asyncio.Task] = None
+
+    async def heartbeat_once(self, db):
+        """Refresh this worker's active jobs and fail other workers' jobs
+        whose heartbeat went stale"""
+        now = datetime.utcnow()
+        if self.tasks:
+            await db.github_sync_jobs.update_many(
+                {"id": {"$in": list(self.tasks)}, "active": True},
+                {"$set": {"heartbeat_at": now.isoformat()}}
+            )
+
+        stale_before = (now - timedelta(seconds=self.stale_after)).isoformat()
+        await db.github_sync_jobs.update_many(
+            {
+                "active": True,
+                "workerId": {"$ne": self.worker_id},
+                "$or": [
+                    {"heartbeat_at": {"$lt": stale_before}},
+                    {"heartbeat_at": {"$exists": False}}
+                ]
+            },
+            {
+                "$set": {"status": "failed", "error": INTERRUPTED_MESSAGE, "updated_at": now.isoformat()},
+                "$unset": {"active": ""}
+            }
+        )
+
+    async def _heartbeat_periodically(self, db):
+        while True:
+            try:
+                await self.heartbeat_once(db)
+            except Exception as e:
+                print(f"GitHub sync job heartbeat failed: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def start(self):
+        db = get_database()
+        if db is None:
+            return
+        if not self.heartbeat:
+            self.heartbeat = asyncio.create_task(self._heartbeat_periodically(db))
+
+    async def stop(self):
+        if self.heartbeat:
+            self.heartbeat.cancel()
+            self.heartbeat = None
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def enqueue(
+        self,
+        db,
+        project: Dict[str, Any],
+        access_token: str,
+        kind: str,
+        params: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Queue a job for the project; returns (job, deduplicated). If the
+        project already has an active job, that job is returned instead."""
+        now = datetime.utcnow().isoformat()
+        job = {
+            "id": str(uuid.uuid4()),
+            "projectId": project["id"],
+            "userKey": job_user_key(project, access_token),
+            "kind": kind,
+            "params": params,
+            "status": "queued",
+            "active": True,
+            "progress": SyncProgress().snapshot(),
+            "result": None,
+            "error": None,
+            "statusCode": None,
+            "workerId": self.worker_id,
+            "heartbeat_at": now,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        for _ in range(2):
+            try:
+                await db.github_sync_jobs.insert_one(dict(job))
+                break
+            except DuplicateKeyError:
+                existing = await db.github_sync_jobs.find_one({"projectId": project["id"], "active": True})
+                if existing:
+                    return await self.get(db, existing["id"]) or job_response(existing), True
+                # The other job finished in between; this one can go ahead.
+        else:
+            raise HTTPException(status_code=409, detail="Another sync of this project is starting; try again")
+
+        self.progress[job["id"]] = SyncProgress()
+        self.tasks[job["id"]] = asyncio.create_task(self.run(db, job, access_token))
+        return job_response(job), False
+
+    async def get(self, db, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await db.github_sync_jobs.find_one({"id": job_id})
+        if not job:
+            return None
+
+        progress = self.progress.get(job_id)
+        if progress:
+            job["progress"] = progress.snapshot()
+        return job_response(job)
+
+    def acquire_user(self, user_key: str) -> asyncio.Semaphore:
+        semaphore, users = self.user_semaphores.get(user_key, (None, 0))
+        if not semaphore:
+            semaphore = asyncio.Semaphore(self.user_concurrency)
+        self.user_semaphores[user_key] = (semaphore, users + 1)
+        return semaphore
+
+    def release_user(self, user_key: str):
+        semaphore, users = self.user_semaphores[user_key]
+        if users <= 1:
+            del self.user_semaphores[user_key]
+        else:
+            self.user_semaphores[user_key] = (semaphore, users - 1)
+
+    async def update_job(self, db, job_id: str, fields: Dict[str, Any], unset_active: bool = False):
+        update: Dict[str, Any] = {"$set": {**fields, "updated_at": datetime.utcnow().isoformat()}}
+        if unset_active:
+            update["$unset"] = {"active": ""}
+        await db.github_sync_jobs.update_one({"id": job_id}, update)
+
+    async def report_progress(self, db, job_id: str, progress: SyncProgress):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            if progress.dirty:
+                progress.dirty = False
+                await self.update_job(db, job_id, {"progress": progress.snapshot()})
+
+    async def run(self, db, job: Dict[str, Any], access_token: str):
+        job_id = job["id"]
+        progress = self.progress[job_id]
+        user_semaphore = self.acquire_user(job["userKey"])
+        reporter = None
+        final: Dict[str, Any] = {}
+
+        try:
+            async with user_semaphore, self.semaphore:
+                progress.set_phase("starting")
+                await self.update_job(db, job_id, {"status": "running", "progress": progress.snapshot()})
+                reporter = asyncio.create_task(self.report_progress(db, job_id, progress))
+
+                # Read the project now, not at enqueue time, so a job that
+                # waited in the queue pushes the latest files.
+                project = await db.projects.find_one({"id": job["projectId"]})
+                if not project:
+                    raise HTTPException(status_code=404, detail="Project not found")
+
+                params = job["params"]
+                if job["kind"] == "create":
+                    result = await sync_new_repo(
+                        db,
+                        project,
+                        access_token,
+                        params["repoName"],
+                        params["description"] or project.get("description", ""),
+                        params["isPrivate"],
+                        progress
+                    )
+                else:
+                    result = await update_repo(db, project, access_token, params["force"], progress)
+
+            progress.set_phase("done")
+            final = {"status": "succeeded", "result": result}
+        except asyncio.CancelledError:
+            final = {"status": "failed", "error": INTERRUPTED_MESSAGE}
+        except HTTPException as e:
+            final = {"status": "failed", "error": e.detail, "statusCode": e.status_code}
+        except Exception as e:
+            final = {"status": "failed", "error": str(e), "statusCode": 500}
+        finally:
+            if reporter:
+                reporter.cancel()
+            self.release_user(job["userKey"])
+            try:
+                await self.update_job(
+                    db, job_id, {**final, "progress": progress.snapshot()}, unset_active=True
+                )
+            except Exception as e:
+                print(f"Failed to record GitHub sync job {job_id}: {e}")
+            self.tasks.pop(job_id, None)
+            self.progress.pop(job_id, None)
+
+github_sync_jobs = GitHubSyncJobs()
@@ -0,0 +1,228 @@
+from fastapi import HTTPException
+from typing import Optional, Dict, Any, List, Tuple
+from blob_store import load_project_files, file_content_text, project_manifest, decode_path
+from github_client import (
+    github_client,
+    git_blob_sha,
+    get_github_login,
+    create_github_repo,
+    get_default_branch,
+    push_files
+)
+
+# After each push the project records `githubCommitSha` and a
+# `githubManifest` of encoded path -> {"hash": content hash, "sha": git blob
+# sha} for what was pushed. The next update compares content hashes with the
+# project manifest, so only changed files are read and uploaded, and nothing
+# at all is sent when nothing changed.
+
+class SyncProgress:
+    """Progress of one sync, updated as it runs"""
+
+    def __init__(self):
+        self.phase = "queued"
+        self.total_files = 0
+        self.uploaded_files = 0
+        self.last_file: Optional[str] = None
+        self.dirty = False
+
+    def set_phase(self, phase: str, total_files: Optional[int] = None):
+        self.phase = phase
+        if total_files is not None:
+            self.total_files = total_files
+        self.dirty = True
+
+    def file_uploaded(self, path: str):
+        self.uploaded_files += 1
+        self.last_file = path
+        self.dirty = True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "phase": self.phase,
+            "totalFiles": self.total_files,
+            "uploadedFiles": self.uploaded_files,
+            "lastFile": self.last_file
+        }
+
+def repo_path(key: str) -> str:
+    return decode_path(key).lstrip("/")
+
+def repo_name_from_url(repo_url: str) -> Tuple[str, str]:
+    owner, repo = repo_url.rstrip("/").split("/")[-2:]
+    return owner, repo
+
+def plan_sync(project: Dict[str, Any], full: bool = False) -> Tuple[List[str], List[str]]:
+    """(changed or added keys, removed keys) since the last push"""
+    manifest = project_manifest(project)
+    pushed = {} if full else project.get("githubManifest") or {}
+    changed = [key for key, digest in manifest.items() if pushed.get(key, {}).get("hash") != digest]
+    removed = [key for key in project.get("githubManifest") or {} if key not in manifest]
+    return changed, removed
+
+def needs_full_push(project: Dict[str, Any], force: bool = False) -> bool:
+    # Projects synced before manifests were recorded get one full push.
+    return force or not project.get("githubCommitSha")
+
+async def push_project(
+    client,
+    db,
+    project: Dict[str, Any],
+    access_token: str,
+    owner: str,
+    repo: str,
+    branch: str,
+    message: str,
+    changed: List[str],
+    removed: List[str],
+    expected_head: Optional[str],
+    progress: SyncProgress
+) -> Tuple[str, Dict[str, Dict[str, str]]]:
+    """Push the changed files and deletions as one commit; returns the commit
+    sha and the githubManifest entries of the pushed files"""
+    manifest = project_manifest(project)
+    progress.set_phase("reading", len(changed))
+    files = await load_project_files(db, project, [decode_path(key) for key in changed])
+    contents = {key: file_content_text(files.get(decode_path(key), "")).encode() for key in changed}
+
+    progress.set_phase("uploading")
+    commit_sha = await push_files(
+        client,
+        access_token,
+        owner,
+        repo,
+        branch,
+        {repo_path(key): data for key, data in contents.items()},
+        message,
+        [repo_path(key) for key in removed],
+        expected_head,
+        progress.file_uploaded
+    )
+    entries = {key: {"hash": manifest[key], "sha": git_blob_sha(data)} for key, data in contents.items()}
+    return commit_sha, entries
+
+async def record_push(
+    db,
+    project_id: str,
+    commit_sha: str,
+    entries: Dict[str, Dict[str, str]],
+    removed: List[str]
+):
+    update: Dict[str, Any] = {"$set": {
+        "githubCommitSha": commit_sha,
+        **{f"githubManifest.{key}": entry for key, entry in entries.items()}
+    }}
+    if removed:
+        update["$unset"] = {f"githubManifest.{key}": "" for key in removed}
+    await db.projects.update_one({"id": project_id}, update)
+
+async def sync_new_repo(
+    db,
+    project: Dict[str, Any],
+    access_token: str,
+    repo_name: str,
+    description: str,
+    is_private: bool,
+    progress: SyncProgress
+) -> Dict[str, Any]:
+    """Create a repository and push the whole project to it. If the project
+    is already synced to a repository of that name (a retried request), it
+    is updated instead of creating a duplicate."""
+    repo_url = project.get("githubRepoUrl")
+    if repo_url and repo_name_from_url(repo_url)[1].lower() == repo_name.lower():
+        return await update_repo(db, project, access_token, False, progress)
+
+    client = github_client()
+    progress.set_phase("creating repository")
+    await get_github_login(client, access_token)
+    repo_data = await create_github_repo(client, access_token, repo_name, description, is_private)
+    repo_url = repo_data.get("html_url")
+
+    # A new repository starts from scratch, whatever was pushed before.
+    changed, _ = plan_sync(project, full=True)
+    commit_sha, entries = await push_project(
+        client,
+        db,
+        project,
+        access_token,
+        repo_data["owner"]["login"],
+        repo_data.get("name"),
+        repo_data.get("default_branch", "main"),
+        "Add project files via Doveable AI",
+        changed,
+        [],
+        None,
+        progress
+    )
+
+    await db.projects.update_one(
+        {"id": project["id"]},
+        {"$set": {
+            "githubSynced": True,
+            "githubRepoUrl": repo_url,
+            "githubCommitSha": commit_sha,
+            "githubManifest": entries
+        }}
+    )
+    return {
+        "repoUrl": repo_url,
+        "commitSha": commit_sha,
+        "changed": len(changed),
+        "deleted": 0,
+        "message": f"Project successfully synced to {repo_url}"
+    }
+
+async def update_repo(
+    db,
+    project: Dict[str, Any],
+    access_token: str,
+    force: bool,
+    progress: SyncProgress
+) -> Dict[str, Any]:
+    """Push the files changed since the last sync as a single commit. Fails
+    with 409 if the repository has commits from elsewhere, unless `force`,
+    which re-uploads every file on top of them."""
+    repo_url = project.get("githubRepoUrl")
+    if not project.get("githubSynced") or not repo_url:
+        raise HTTPException(status_code=400, detail="Project is not synced with GitHub")
+
+    full = needs_full_push(project, force)
+    changed, removed = plan_sync(project, full)
+    if not changed and not removed:
+        progress.set_phase("done", 0)
+        return {
+            "repoUrl": repo_url,
+            "commitSha": project.get("githubCommitSha"),
+            "changed": 0,
+            "deleted": 0,
+            "message": f"{repo_url} is already up to date"
+        }
+
+    owner, repo_name = repo_name_from_url(repo_url)
+    client = github_client()
+    await get_github_login(client, access_token)
+    branch = await get_default_branch(client, access_token, owner, repo_name)
+
+    commit_sha, entries = await push_project(
+        client,
+        db,
+        project,
+        access_token,
+        owner,
+        repo_name,
+        branch,
+        "Update project files via Doveable AI",
+        changed,
+        removed,
+        None if full else project["githubCommitSha"],
+        progress
+    )
+
+    await record_push(db, project["id"], commit_sha, entries, removed)
+    return {
+        "repoUrl": repo_url,
+        "commitSha": commit_sha,
+        "changed": len(changed),
+        "deleted": len(removed),
+        "message": f"Project successfully updated in {repo_url}"
+    }
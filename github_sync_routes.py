@@ -1,188 +1,73 @@
 from fastapi import APIRouter, HTTPException
-import httpx
-import os
-import base64
-from typing import Dict, Any, List
-from schemas import ProjectSchema, SyncProjectToGitHubRequest
+from fastapi.responses import JSONResponse
+from typing import Dict, Any
+from schemas import SyncProjectToGitHubRequest
 from database import get_database
+from github_sync import needs_full_push, plan_sync
+from github_jobs import github_sync_jobs
 
 router = APIRouter(prefix="/api/github-sync", tags=["GitHub Sync"])
 
-async def create_github_repo(access_token: str, repo_name: str, description: str, is_private: bool) -> Dict[str, Any]:
-    """Create a new GitHub repository"""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.github.com/user/repos",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/vnd.github.v3+json"
-            },
-            json={
-                "name": repo_name,
-                "description": description,
-                "private": is_private,
-                "auto_init": True
-            }
-        )
-        
-        if response.status_code not in [201, 200]:
-            error_data = response.json()
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=error_data.get("message", "Failed to create repository")
-            )
-        
-        return response.json()
+# Syncs run in the background: both POST routes answer 202 with a job id at
+# once, and GET /jobs/{id} reports the job's status and per-file progress.
 
-async def create_or_update_file(
-    access_token: str,
-    owner: str,
-    repo: str,
-    path: str,
-    content: str,
-    message: str,
-    sha: str = None
-) -> Dict[str, Any]:
-    """Create or update a file in GitHub repository"""
-    async with httpx.AsyncClient() as client:
-        encoded_content = base64.b64encode(content.encode()).decode()
-        
-        data = {
-            "message": message,
-            "content": encoded_content
+def job_accepted(job: Dict[str, Any], deduplicated: bool, message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "jobId": job["id"],
+            "status": job["status"],
+            "deduplicated": deduplicated,
+            "message": "A sync for this project is already in progress" if deduplicated else message
         }
-        
-        if sha:
-            data["sha"] = sha
-        
-        response = await client.put(
-            f"https://api.github.com/repos/{owner}/{repo}/contents/{path}",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/vnd.github.v3+json"
-            },
-            json=data
-        )
-        
-        if response.status_code not in [200, 201]:
-            error_data = response.json()
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=error_data.get("message", f"Failed to create/update file: {path}")
-            )
-        
-        return response.json()
-
-async def get_file_sha(access_token: str, owner: str, repo: str, path: str) -> str:
-    """Get the SHA of a file in the repository (if it exists)"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"https://api.github.com/repos/{owner}/{repo}/contents/{path}",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/vnd.github.v3+json"
-            }
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("sha")
-        
-        return None
+    )
 
 @router.post("/sync")
 async def sync_project_to_github(
     request: SyncProjectToGitHubRequest,
     accessToken: str
 ):
-    """Sync a project to GitHub repository"""
+    """Start syncing a project to a new GitHub repository as a single commit"""
     
     db = get_database()
-    if not db:
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
     
-    projects_collection = db.projects
-    project = await projects_collection.find_one({"id": request.projectId})
+    project = await db.projects.find_one({"id": request.projectId}, {"_id": 0, "id": 1, "userId": 1})
     
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    try:
-        async with httpx.AsyncClient() as client:
-            user_response = await client.get(
-                "https://api.github.com/user",
-                headers={
-                    "Authorization": f"Bearer {accessToken}",
-                    "Accept": "application/vnd.github.v3+json"
-                }
-            )
-            
-            if user_response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Invalid GitHub access token")
-            
-            user_data = user_response.json()
-            username = user_data.get("login")
-        
-        repo_data = await create_github_repo(
-            accessToken,
-            request.repoName,
-            request.description or project.get("description", ""),
-            request.isPrivate
-        )
-        
-        repo_url = repo_data.get("html_url")
-        repo_name = repo_data.get("name")
-        
-        files = project.get("files", {})
-        
-        for file_path, file_content in files.items():
-            if isinstance(file_content, dict):
-                file_content = file_content.get("content", "")
-            
-            sha = await get_file_sha(accessToken, username, repo_name, file_path)
-            
-            await create_or_update_file(
-                accessToken,
-                username,
-                repo_name,
-                file_path,
-                str(file_content),
-                f"Add/Update {file_path}",
-                sha
-            )
-        
-        await projects_collection.update_one(
-            {"id": request.projectId},
-            {"$set": {
-                "githubSynced": True,
-                "githubRepoUrl": repo_url
-            }}
-        )
-        
-        return {
-            "success": True,
-            "repoUrl": repo_url,
-            "message": f"Project successfully synced to {repo_url}"
+    job, deduplicated = await github_sync_jobs.enqueue(
+        db,
+        project,
+        accessToken,
+        "create",
+        {
+            "repoName": request.repoName,
+            "description": request.description,
+            "isPrivate": request.isPrivate
         }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    )
+    
+    return job_accepted(job, deduplicated, f"Syncing project to {request.repoName}")
 
 @router.post("/update")
 async def update_github_repo(
     projectId: str,
-    accessToken: str
+    accessToken: str,
+    force: bool = False
 ):
-    """Update existing GitHub repository with latest project changes"""
+    """Start pushing the files changed since the last sync as a single commit.
+    The job fails with 409 if the repository has commits from elsewhere,
+    unless force=true, which re-uploads every file on top of them."""
     
     db = get_database()
-    if not db:
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not connected")
     
-    projects_collection = db.projects
-    project = await projects_collection.find_one({"id": projectId})
+    project = await db.projects.find_one({"id": projectId})
     
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -190,49 +75,34 @@ async def update_github_repo(
     if not project.get("githubSynced") or not project.get("githubRepoUrl"):
         raise HTTPException(status_code=400, detail="Project is not synced with GitHub")
     
-    try:
-        async with httpx.AsyncClient() as client:
-            user_response = await client.get(
-                "https://api.github.com/user",
-                headers={
-                    "Authorization": f"Bearer {accessToken}",
-                    "Accept": "application/vnd.github.v3+json"
-                }
-            )
-            
-            if user_response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Invalid GitHub access token")
-            
-            user_data = user_response.json()
-            username = user_data.get("login")
-        
-        repo_url = project.get("githubRepoUrl")
-        repo_name = repo_url.split("/")[-1]
-        
-        files = project.get("files", {})
-        
-        for file_path, file_content in files.items():
-            if isinstance(file_content, dict):
-                file_content = file_content.get("content", "")
-            
-            sha = await get_file_sha(accessToken, username, repo_name, file_path)
-            
-            await create_or_update_file(
-                accessToken,
-                username,
-                repo_name,
-                file_path,
-                str(file_content),
-                f"Update {file_path} via Doveable AI",
-                sha
-            )
-        
+    repo_url = project.get("githubRepoUrl")
+    changed, removed = plan_sync(project, needs_full_push(project, force))
+    if not changed and not removed:
         return {
             "success": True,
-            "message": f"Project successfully updated in {repo_url}"
+            "message": f"{repo_url} is already up to date",
+            "commitSha": project.get("githubCommitSha"),
+            "changed": 0,
+            "deleted": 0
         }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    job, deduplicated = await github_sync_jobs.enqueue(db, project, accessToken, "update", {"force": force})
+    
+    return job_accepted(job, deduplicated, f"Updating {repo_url}")
+
+@router.get("/jobs/{job_id}")
+async def get_sync_job(job_id: str):
+    """Status of a sync job: queued, running, succeeded or failed, with
+    progress {phase, totalFiles, uploadedFiles, lastFile} and, once finished,
+    the result or the error and its statusCode"""
+    
+    db = get_database()
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    
+    job = await github_sync_jobs.get(db, job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    
+    return job
@@ -0,0 +1,148 @@
+import os
+import random
+import asyncio
+import importlib.util
+import httpx
+from typing import Optional, Dict, Any, List, Callable
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+HTTP_RETRY_MAX_WAIT = float(os.getenv("HTTP_RETRY_MAX_WAIT", "10"))
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]").
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+# All outbound calls to GitHub and Google share one long-lived client per
+# host, so requests reuse keep-alive connections (or one multiplexed HTTP/2
+# connection) instead of paying a TCP + TLS handshake every time. The
+# clients are created on first use and closed in the app lifespan.
+
+def retry_delay(response: Optional[httpx.Response], attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying, or None if the response is final"""
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                return None
+            return delay if delay <= HTTP_RETRY_MAX_WAIT else None
+    # Full jitter, so clients that failed together do not retry together.
+    return random.uniform(0, min(HTTP_RETRY_MAX_WAIT, HTTP_RETRY_BACKOFF * 2 ** attempt))
+
+def should_retry(request: httpx.Request, response: httpx.Response) -> bool:
+    # Rate-limited requests were rejected before doing anything, so any
+    # method can be retried; server errors only for idempotent methods.
+    # An exhausted primary limit (remaining 0) resets within the hour and
+    # is not worth waiting for here.
+    if response.headers.get("x-ratelimit-remaining") == "0":
+        return False
+    if response.status_code == 429:
+        return True
+    if response.status_code == 403 and "retry-after" in response.headers:
+        return True
+    return response.status_code in RETRY_STATUS_CODES and request.method in IDEMPOTENT_METHODS
+
+class RetryTransport(httpx.AsyncHTTPTransport):
+    """Pooled transport that retries transient failures with jittered
+    backoff and counts new versus reused connections"""
+
+    def __init__(self, stats: Dict[str, int], max_retries: int = HTTP_MAX_RETRIES, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+        self.max_retries = max_retries
+
+    async def trace(self, event: str, info: Dict[str, Any]):
+        if event == "connection.connect_tcp.complete":
+            self.stats["connections"] += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions = {**request.extensions, "trace": self.trace}
+        attempt = 0
+        while True:
+            self.stats["requests"] += 1
+            try:
+                response = await super().handle_async_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                # Nothing was sent, so retrying is safe for any method.
+                self.stats["errors"] += 1
+                if attempt >= self.max_retries:
+                    raise
+                delay = retry_delay(None, attempt)
+            else:
+                if attempt >= self.max_retries or not should_retry(request, response):
+                    return response
+                delay = retry_delay(response, attempt)
+                if delay is None:
+                    return response
+                await response.aclose()
+
+            self.stats["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+class OutboundHTTP:
+    """Registry of pooled clients, one per host"""
+
+    def __init__(self):
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def client(
+        self,
+        base_url: str,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        event_hooks: Optional[Dict[str, List[Callable]]] = None
+    ) -> httpx.AsyncClient:
+        """The pooled client for `base_url`'s host; `event_hooks` only
+        apply when this call creates it"""
+        host = httpx.URL(base_url).netloc.decode()
+        if host not in self.clients:
+            self.stats[host] = {"requests": 0, "connections": 0, "retries": 0, "errors": 0}
+            transport = RetryTransport(
+                self.stats[host],
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+                )
+            )
+            self.clients[host] = httpx.AsyncClient(
+                base_url=base_url,
+                transport=transport,
+                timeout=httpx.Timeout(
+                    read_timeout,
+                    connect=HTTP_CONNECT_TIMEOUT,
+                    pool=HTTP_POOL_TIMEOUT
+                ),
+                event_hooks=event_hooks
+            )
+        return self.clients[host]
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        hosts = {}
+        for host, stats in self.stats.items():
+            reused = max(stats["requests"] - stats["connections"] - stats["errors"], 0)
+            hosts[host] = {
+                **stats,
+                "reused": reused,
+                "reuse_rate": round(reused / stats["requests"], 3) if stats["requests"] else 0.0
+            }
+        return {"http2": HTTP2_AVAILABLE, "hosts": hosts}
+
+outbound_http = OutboundHTTP()
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Callable, Awaitable
+from database import get_database
+
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_SHARED = os.getenv("LLM_CACHE_SHARED", "false").lower() == "true"
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so cosmetic differences don't miss the cache"""
+    return " ".join(prompt.split())
+
+def make_cache_key(
+    provider: str,
+    model: str,
+    prompt: str,
+    max_tokens: int,
+    temperature: float
+) -> str:
+    payload = json.dumps(
+        [provider, model, normalize_prompt(prompt), max_tokens, temperature],
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class CompletionCache:
+    """Two-tier completion cache: an in-process LRU in front of an optional
+    MongoDB collection shared between workers. Identical requests that are
+    in flight at the same time share a single upstream call."""
+    
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+        shared: bool = LLM_CACHE_SHARED
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "shared_errors": 0
+        }
+    
+    def is_cacheable(self, temperature: float, opt_in: bool = False) -> bool:
+        return opt_in or temperature == 0
+    
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        
+        self.entries.move_to_end(key)
+        return value
+    
+    def _set_local(self, key: str, value: Dict[str, Any]):
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    def _shared_collection(self):
+        if not self.shared:
+            return None
+        db = get_database()
+        if db is None:
+            return None
+        return db.llm_cache
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._get_local(key)
+        if value:
+            self.stats["hits"] += 1
+            return value
+        
+        collection = self._shared_collection()
+        if collection is not None:
+            try:
+                doc = await collection.find_one(
+                    {"_id": key, "expires_at": {"$gt": datetime.utcnow()}}
+                )
+            except Exception:
+                self.stats["shared_errors"] += 1
+                doc = None
+            if doc:
+                self.stats["shared_hits"] += 1
+                self._set_local(key, doc["value"])
+                return doc["value"]
+        
+        self.stats["misses"] += 1
+        return None
+    
+    async def set(self, key: str, value: Dict[str, Any]):
+        self._set_local(key, value)
+        
+        collection = self._shared_collection()
+        if collection is not None:
+            try:
+                await collection.replace_one(
+                    {"_id": key},
+                    {
+                        "_id": key,
+                        "value": value,
+                        "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+                    },
+                    upsert=True
+                )
+            except Exception:
+                self.stats["shared_errors"] += 1
+    
+    async def _compute_and_store(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        value = await compute()
+        if value.get("success"):
+            await self.set(key, value)
+        return value
+    
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        task = self.inflight.get(key)
+        owner = False
+        if task:
+            self.stats["coalesced"] += 1
+        else:
+            cached = await self.get(key)
+            if cached:
+                return {**cached, "cached": True}
+            
+            task = self.inflight.get(key)
+            if task:
+                self.stats["coalesced"] += 1
+            else:
+                task = asyncio.ensure_future(self._compute_and_store(key, compute))
+                self.inflight[key] = task
+                task.add_done_callback(lambda _: self.inflight.pop(key, None))
+                owner = True
+        
+        # Shield so one caller disconnecting doesn't cancel the upstream
+        # call that other coalesced callers are waiting on.
+        result = await asyncio.shield(task)
+        if owner:
+            return result
+        # Only the caller that made the upstream call pays for it.
+        return {**result, "cached": True, "coalesced": True}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["shared_hits"] + self.stats["misses"]
+        hits = self.stats["hits"] + self.stats["shared_hits"]
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "inflight": len(self.inflight),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "shared_enabled": self.shared
+        }
@@ -0,0 +1,114 @@
+import os
+import math
+from collections import deque
+from typing import Optional, Dict, Any, List, Tuple
+
+LLM_ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "100"))
+LLM_ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "5"))
+LLM_ROUTER_MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+
+class ProviderStats:
+    """Rolling window of latencies and outcomes for one provider/model pair"""
+    
+    def __init__(self, window: int):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.total_requests = 0
+        self.total_errors = 0
+    
+    def record(self, latency: float, success: bool):
+        self.total_requests += 1
+        self.outcomes.append(success)
+        if success:
+            self.latencies.append(latency)
+        else:
+            self.total_errors += 1
+    
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+    
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+class ProviderRouter:
+    """Ranks providers for "auto" requests by observed latency and error rate.
+    
+    Unhealthy pairs always go last. Pairs without enough samples (successes
+    or failures) rank first so they get measured; after that healthy pairs
+    are ordered by median latency.
+    """
+    
+    def __init__(
+        self,
+        window: int = LLM_ROUTER_WINDOW,
+        min_samples: int = LLM_ROUTER_MIN_SAMPLES,
+        max_error_rate: float = LLM_ROUTER_MAX_ERROR_RATE
+    ):
+        self.window = window
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.stats: Dict[Tuple[str, str], ProviderStats] = {}
+    
+    def _get_stats(self, provider: str, model: str) -> ProviderStats:
+        key = (provider, model)
+        if key not in self.stats:
+            self.stats[key] = ProviderStats(self.window)
+        return self.stats[key]
+    
+    def record(self, provider: str, model: str, latency: float, success: bool):
+        self._get_stats(provider, model).record(latency, success)
+    
+    def is_healthy(self, provider: str, model: str) -> bool:
+        stats = self.stats.get((provider, model))
+        if not stats or len(stats.outcomes) < self.min_samples:
+            return True
+        return stats.error_rate() <= self.max_error_rate
+    
+    def rank(self, candidates: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        def sort_key(item):
+            position, (provider, model) = item
+            stats = self.stats.get((provider, model))
+            if not self.is_healthy(provider, model):
+                return (2, stats.error_rate(), position)
+            # Failures count as samples too: only successes have latencies.
+            if not stats or len(stats.outcomes) < self.min_samples:
+                return (0, 0.0, position)
+            median = stats.percentile(0.5)
+            return (1, median if median is not None else math.inf, position)
+        
+        return [candidate for _, candidate in sorted(enumerate(candidates), key=sort_key)]
+    
+    def hedge_delay(self, provider: str, model: str) -> Optional[float]:
+        """p95 latency to wait before hedging, or None until enough samples exist"""
+        stats = self.stats.get((provider, model))
+        if not stats or len(stats.latencies) < self.min_samples:
+            return None
+        return stats.percentile(0.95)
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "provider": provider,
+                "model": model,
+                "healthy": self.is_healthy(provider, model),
+                "samples": len(stats.outcomes),
+                "total_requests": stats.total_requests,
+                "total_errors": stats.total_errors,
+                "error_rate": round(stats.error_rate(), 4),
+                "p50_ms": _to_ms(stats.percentile(0.5)),
+                "p95_ms": _to_ms(stats.percentile(0.95)),
+                "p99_ms": _to_ms(stats.percentile(0.99))
+            }
+            for (provider, model), stats in self.stats.items()
+        ]
+
+def _to_ms(seconds: Optional[float]) -> Optional[float]:
+    if seconds is None:
+        return None
+    return round(seconds * 1000, 1)
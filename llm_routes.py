@@ -1,29 +1,157 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from schemas import GenerateRequest, GenerateResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Union
+import json
+from schemas import GenerateRequest, GenerateResponse, BatchGenerateRequest, BatchGenerateResponse, WebsiteGenerateRequest
 from llm_service import LLMService
 
 router = APIRouter(prefix="/api/llm", tags=["LLM"])
 llm_service = LLMService()
 
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def generate_kwargs(request: GenerateRequest) -> Dict[str, Any]:
+    return {
+        "prompt": request.prompt,
+        "provider": request.provider,
+        "model": request.model,
+        "max_tokens": request.max_tokens,
+        "temperature": request.temperature,
+        "cache": request.cache,
+        "hedge": request.hedge,
+        "system": request.system,
+        "history": [turn.model_dump() for turn in request.history],
+        "user_id": request.userId
+    }
+
+def build_website_page_requests(
+    website: WebsiteGenerateRequest,
+    user_id: Optional[str] = None
+) -> List[GenerateRequest]:
+    pages = max(1, website.pages or 1)
+    return [
+        GenerateRequest(
+            prompt=(
+                f"Generate page {page} of {pages} for a {website.style} website.\n"
+                f"Website description: {website.description}\n"
+                "Return complete, self-contained HTML for this page with navigation links to the other pages."
+            ),
+            userId=user_id
+        )
+        for page in range(1, pages + 1)
+    ]
+
+def build_batch_requests(batch: BatchGenerateRequest) -> List[Dict[str, Any]]:
+    requests = list(batch.requests)
+    if batch.website:
+        requests.extend(build_website_page_requests(batch.website, batch.userId))
+    
+    if not requests:
+        raise HTTPException(status_code=400, detail="Batch must contain requests or a website")
+    
+    return [generate_kwargs(request) for request in requests]
+
 @router.post("/generate", response_model=GenerateResponse)
 async def generate_text(request: GenerateRequest):
-    result = await llm_service.generate(
-        prompt=request.prompt,
-        provider=request.provider,
-        model=request.model,
-        max_tokens=request.max_tokens,
-        temperature=request.temperature
-    )
+    result = await llm_service.generate(**generate_kwargs(request))
     
     if not result["success"]:
         raise HTTPException(status_code=500, detail=result.get("error", "Generation failed"))
     
     return GenerateResponse(**result)
 
+@router.post("/generate/stream")
+async def generate_text_stream(request: GenerateRequest, http_request: Request):
+    """Stream generated tokens as Server-Sent Events, ending with a done or error event"""
+    async def event_source():
+        events = llm_service.stream(
+            prompt=request.prompt,
+            provider=request.provider,
+            model=request.model,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature,
+            system=request.system,
+            history=[turn.model_dump() for turn in request.history],
+            user_id=request.userId
+        )
+        try:
+            # StreamingResponse only pulls the next event once the previous
+            # one has been sent, so a slow client throttles the upstream read.
+            async for event in events:
+                if await http_request.is_disconnected():
+                    break
+                yield format_sse(event)
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/generate/batch", response_model=BatchGenerateResponse)
+async def generate_batch(batch: BatchGenerateRequest):
+    """Run several generations concurrently; results keep the request order"""
+    requests = build_batch_requests(batch)
+    results: List[Dict[str, Any]] = [None] * len(requests)
+    
+    async for index, result in llm_service.generate_batch(requests, batch.parallelism):
+        results[index] = result
+    
+    succeeded = sum(1 for result in results if result["success"])
+    return BatchGenerateResponse(
+        results=[GenerateResponse(**result) for result in results],
+        succeeded=succeeded,
+        failed=len(results) - succeeded
+    )
+
+@router.post("/generate/batch/stream")
+async def generate_batch_stream(batch: BatchGenerateRequest, http_request: Request):
+    """Stream each batch result as a Server-Sent Event as soon as it completes"""
+    requests = build_batch_requests(batch)
+    
+    async def event_source():
+        results = llm_service.generate_batch(requests, batch.parallelism)
+        succeeded = 0
+        try:
+            async for index, result in results:
+                if await http_request.is_disconnected():
+                    break
+                succeeded += 1 if result["success"] else 0
+                yield format_sse({"type": "result", "index": index, **result})
+            else:
+                yield format_sse({
+                    "type": "done",
+                    "total": len(requests),
+                    "succeeded": succeeded,
+                    "failed": len(requests) - succeeded
+                })
+        finally:
+            await results.aclose()
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/providers")
-async def get_providers() -> List[str]:
-    return llm_service.get_available_providers()
+async def get_providers(details: bool = False) -> Union[List[str], Dict[str, Any]]:
+    """List configured providers; with details=true, include routing statistics"""
+    providers = llm_service.get_available_providers()
+    if not details:
+        return providers
+    
+    return {
+        "providers": providers,
+        "ranking": [
+            {"provider": provider, "model": model}
+            for provider, model in llm_service.rank_candidates()
+        ],
+        "router": llm_service.router.snapshot()
+    }
 
 @router.get("/health")
 async def health_check():
@@ -31,5 +159,13 @@ async def health_check():
     return {
         "status": "healthy",
         "available_providers": providers,
-        "total_providers": len(providers)
+        "total_providers": len(providers),
+        "cache": llm_service.cache.get_stats(),
+        "circuit_breakers": {
+            name: breaker.snapshot()
+            for name, breaker in llm_service.breakers.items()
+            if name in providers
+        },
+        "rate_limits": llm_service.rate_limiter.snapshot(),
+        "context_compaction": llm_service.compactor.get_stats()
     }
@@ -1,8 +1,124 @@
 import os
-from typing import Optional, Dict, Any, List
-from openai import OpenAI
-from groq import Groq
+import json
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Dict, Any, List, Tuple, Callable, AsyncIterator, NamedTuple
+import httpx
+from openai import AsyncOpenAI
+from groq import AsyncGroq
 import google.generativeai as genai
+from llm_cache import CompletionCache, make_cache_key
+from llm_router import ProviderRouter
+from circuit_breaker import CircuitBreaker
+from rate_limiter import RateLimiter, RateLimitExceeded
+from usage import usage_meter
+from context import (
+    HistoryCompactor,
+    build_messages,
+    count_message_tokens,
+    estimate_tokens,
+    to_gemini_contents,
+    truncate_turns
+)
+
+LLM_THREAD_POOL_SIZE = int(os.getenv("LLM_THREAD_POOL_SIZE", "8"))
+LLM_HEDGE_DEFAULT = os.getenv("LLM_HEDGE_DEFAULT", "false").lower() == "true"
+LLM_PROVIDER_TIMEOUT = float(os.getenv("LLM_PROVIDER_TIMEOUT", "60"))
+LLM_BATCH_PARALLELISM = int(os.getenv("LLM_BATCH_PARALLELISM", "4"))
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+LLM_HTTP_READ_TIMEOUT = float(os.getenv("LLM_HTTP_READ_TIMEOUT", "120"))
+LLM_MODEL_CACHE_SIZE = int(os.getenv("LLM_MODEL_CACHE_SIZE", "64"))
+LLM_SUMMARIZE_HISTORY = os.getenv("LLM_SUMMARIZE_HISTORY", "false").lower() == "true"
+LLM_SUMMARY_MAX_TOKENS = int(os.getenv("LLM_SUMMARY_MAX_TOKENS", "300"))
+LLM_FALLBACK_CHAIN = [
+    name.strip()
+    for name in os.getenv("LLM_FALLBACK_CHAIN", "groq,gemini,emergent,openai").split(",")
+    if name.strip()
+]
+
+# Per-provider semaphores of the batch the current task belongs to, if any.
+batch_semaphores: contextvars.ContextVar[Optional[Dict[str, asyncio.Semaphore]]] = contextvars.ContextVar(
+    "batch_semaphores", default=None
+)
+
+DEFAULT_MODELS = {
+    "groq": "mixtral-8x7b-32768",
+    "gemini": "gemini-pro",
+    "emergent": "gpt-3.5-turbo",
+    "openai": "gpt-3.5-turbo"
+}
+
+class Completion(NamedTuple):
+    text: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+def completion_from_chat(completion) -> Completion:
+    usage = getattr(completion, "usage", None)
+    return Completion(
+        completion.choices[0].message.content,
+        getattr(usage, "prompt_tokens", None),
+        getattr(usage, "completion_tokens", None)
+    )
+
+class ClientRegistry:
+    """Long-lived SDK handles shared across requests.
+    
+    Each OpenAI-compatible provider gets its own pooled keep-alive HTTP
+    transport, and Gemini model handles are cached per (model, config) so
+    repeated calls skip client construction.
+    """
+    
+    def __init__(self, model_cache_size: int = LLM_MODEL_CACHE_SIZE):
+        self.http_clients: Dict[str, httpx.AsyncClient] = {}
+        self.models: "OrderedDict[Tuple, Tuple[Any, Any]]" = OrderedDict()
+        self.model_cache_size = model_cache_size
+    
+    def http_client(self, provider: str) -> httpx.AsyncClient:
+        if provider not in self.http_clients:
+            self.http_clients[provider] = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(
+                    LLM_HTTP_READ_TIMEOUT,
+                    connect=LLM_HTTP_CONNECT_TIMEOUT
+                )
+            )
+        return self.http_clients[provider]
+    
+    def gemini_model(self, model: str, max_tokens: int, temperature: float) -> Tuple[Any, Any]:
+        key = ("gemini", model, max_tokens, temperature)
+        if key in self.models:
+            self.models.move_to_end(key)
+            return self.models[key]
+        
+        handle = (
+            genai.GenerativeModel(model),
+            genai.types.GenerationConfig(
+                max_output_tokens=max_tokens,
+                temperature=temperature
+            )
+        )
+        self.models[key] = handle
+        while len(self.models) > self.model_cache_size:
+            self.models.popitem(last=False)
+        return handle
+    
+    async def close(self):
+        for client in self.http_clients.values():
+            await client.aclose()
+        self.http_clients.clear()
+        self.models.clear()
 
 class LLMService:
     def __init__(self):
@@ -15,156 +131,684 @@ class LLMService:
         self.openai_client = None
         self.emergent_client = None
         
+        # SDKs without an async client are bridged through this bounded pool
+        # so a slow call never blocks the event loop.
+        self.executor = ThreadPoolExecutor(
+            max_workers=LLM_THREAD_POOL_SIZE,
+            thread_name_prefix="llm-blocking"
+        )
+        
+        self.clients = ClientRegistry()
+        
         if self.groq_key:
-            self.groq_client = Groq(api_key=self.groq_key)
+            self.groq_client = AsyncGroq(
+                api_key=self.groq_key,
+                http_client=self.clients.http_client("groq")
+            )
         
         if self.openai_key:
-            self.openai_client = OpenAI(api_key=self.openai_key)
+            self.openai_client = AsyncOpenAI(
+                api_key=self.openai_key,
+                http_client=self.clients.http_client("openai")
+            )
         
         if self.emergent_key:
-            self.emergent_client = OpenAI(
+            self.emergent_client = AsyncOpenAI(
                 api_key=self.emergent_key,
-                base_url="https://api.emergentmethods.ai/v1"
+                base_url="https://api.emergentmethods.ai/v1",
+                http_client=self.clients.http_client("emergent")
             )
         
         if self.gemini_key:
             genai.configure(api_key=self.gemini_key)
+        
+        self.cache = CompletionCache()
+        self.router = ProviderRouter()
+        self.breakers = {name: CircuitBreaker(name) for name in DEFAULT_MODELS}
+        self.rate_limiter = RateLimiter()
+        self.meter = usage_meter
+        self.compactor = HistoryCompactor(
+            summarize=self._summarize_turns if LLM_SUMMARIZE_HISTORY else None
+        )
+    
+    async def run_blocking(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+    
+    async def close(self):
+        for client in (self.groq_client, self.openai_client, self.emergent_client):
+            if client:
+                await client.close()
+        await self.clients.close()
+        self.executor.shutdown(wait=False)
     
     async def generate_with_groq(
         self,
-        prompt: str,
+        messages: List[Dict[str, str]],
         model: str = "mixtral-8x7b-32768",
         max_tokens: int = 2000,
         temperature: float = 0.7
-    ) -> str:
+    ) -> Completion:
         if not self.groq_client:
             raise ValueError("Groq API key not configured")
         
         try:
-            completion = self.groq_client.chat.completions.create(
+            completion = await self.groq_client.chat.completions.create(
                 model=model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=messages,
                 max_tokens=max_tokens,
                 temperature=temperature
             )
-            return completion.choices[0].message.content
+            return completion_from_chat(completion)
         except Exception as e:
             raise Exception(f"Groq API error: {str(e)}")
     
     async def generate_with_openai(
         self,
-        prompt: str,
+        messages: List[Dict[str, str]],
         model: str = "gpt-3.5-turbo",
         max_tokens: int = 2000,
         temperature: float = 0.7
-    ) -> str:
+    ) -> Completion:
         if not self.openai_client:
             raise ValueError("OpenAI API key not configured")
         
         try:
-            completion = self.openai_client.chat.completions.create(
+            completion = await self.openai_client.chat.completions.create(
                 model=model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=messages,
                 max_tokens=max_tokens,
                 temperature=temperature
             )
-            return completion.choices[0].message.content
+            return completion_from_chat(completion)
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
     
     async def generate_with_emergent(
         self,
-        prompt: str,
+        messages: List[Dict[str, str]],
         model: str = "gpt-3.5-turbo",
         max_tokens: int = 2000,
         temperature: float = 0.7
-    ) -> str:
+    ) -> Completion:
         if not self.emergent_client:
             raise ValueError("Emergent LLM API key not configured")
         
         try:
-            completion = self.emergent_client.chat.completions.create(
+            completion = await self.emergent_client.chat.completions.create(
                 model=model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=messages,
                 max_tokens=max_tokens,
                 temperature=temperature
             )
-            return completion.choices[0].message.content
+            return completion_from_chat(completion)
         except Exception as e:
             raise Exception(f"Emergent LLM API error: {str(e)}")
     
     async def generate_with_gemini(
         self,
-        prompt: str,
+        messages: List[Dict[str, str]],
         model: str = "gemini-pro",
         max_tokens: int = 2000,
         temperature: float = 0.7
-    ) -> str:
+    ) -> Completion:
         if not self.gemini_key:
             raise ValueError("Google Gemini API key not configured")
         
         try:
-            model_instance = genai.GenerativeModel(model)
-            generation_config = genai.types.GenerationConfig(
-                max_output_tokens=max_tokens,
-                temperature=temperature
+            model_instance, generation_config = self.clients.gemini_model(
+                model, max_tokens, temperature
             )
-            response = model_instance.generate_content(
-                prompt,
-                generation_config=generation_config
+            if hasattr(model_instance, "generate_content_async"):
+                response = await model_instance.generate_content_async(
+                    to_gemini_contents(messages),
+                    generation_config=generation_config
+                )
+            else:
+                response = await self.run_blocking(
+                    model_instance.generate_content,
+                    to_gemini_contents(messages),
+                    generation_config=generation_config
+                )
+            usage = getattr(response, "usage_metadata", None)
+            return Completion(
+                response.text,
+                getattr(usage, "prompt_token_count", None),
+                getattr(usage, "candidates_token_count", None)
             )
-            return response.text
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
     
+    async def _stream_chat_completion(
+        self,
+        client,
+        label: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        max_tokens: int,
+        temperature: float
+    ) -> AsyncIterator[str]:
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+        except Exception as e:
+            raise Exception(f"{label} API error: {str(e)}")
+        
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Closing the response aborts the upstream request when the
+            # consumer stops early (e.g. the HTTP client disconnected).
+            await stream.response.aclose()
+    
+    async def stream_with_groq(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "mixtral-8x7b-32768",
+        max_tokens: int = 2000,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        if not self.groq_client:
+            raise ValueError("Groq API key not configured")
+        
+        async for text in self._stream_chat_completion(
+            self.groq_client, "Groq", messages, model, max_tokens, temperature
+        ):
+            yield text
+    
+    async def stream_with_openai(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-3.5-turbo",
+        max_tokens: int = 2000,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        if not self.openai_client:
+            raise ValueError("OpenAI API key not configured")
+        
+        async for text in self._stream_chat_completion(
+            self.openai_client, "OpenAI", messages, model, max_tokens, temperature
+        ):
+            yield text
+    
+    async def stream_with_emergent(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-3.5-turbo",
+        max_tokens: int = 2000,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        if not self.emergent_client:
+            raise ValueError("Emergent LLM API key not configured")
+        
+        async for text in self._stream_chat_completion(
+            self.emergent_client, "Emergent LLM", messages, model, max_tokens, temperature
+        ):
+            yield text
+    
+    async def stream_with_gemini(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gemini-pro",
+        max_tokens: int = 2000,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        if not self.gemini_key:
+            raise ValueError("Google Gemini API key not configured")
+        
+        model_instance, generation_config = self.clients.gemini_model(
+            model, max_tokens, temperature
+        )
+        
+        try:
+            if hasattr(model_instance, "generate_content_async"):
+                response = await model_instance.generate_content_async(
+                    to_gemini_contents(messages),
+                    generation_config=generation_config,
+                    stream=True
+                )
+                async for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
+            else:
+                response = await self.run_blocking(
+                    model_instance.generate_content,
+                    to_gemini_contents(messages),
+                    generation_config=generation_config,
+                    stream=True
+                )
+                # Pull one chunk per pool task so the bridge never reads
+                # ahead of the consumer.
+                chunks = iter(response)
+                done = object()
+                while True:
+                    chunk = await self.run_blocking(next, chunks, done)
+                    if chunk is done:
+                        break
+                    if chunk.text:
+                        yield chunk.text
+        except Exception as e:
+            raise Exception(f"Gemini API error: {str(e)}")
+    
+    def rank_candidates(self, model: Optional[str] = None) -> List[Tuple[str, str]]:
+        candidates = [
+            (provider, model or DEFAULT_MODELS[provider])
+            for provider in self.get_available_providers()
+        ]
+        return self.router.rank(candidates)
+    
+    def build_chain(self, provider: str, model: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Providers to try in order: the requested (or best-ranked) one first,
+        then the configured fallbacks, skipping any whose breaker is open."""
+        if provider == "auto":
+            chain = self.rank_candidates(model)
+        else:
+            available = self.get_available_providers()
+            chain = [(provider, model or DEFAULT_MODELS.get(provider))]
+            chain.extend(
+                (fallback, DEFAULT_MODELS[fallback])
+                for fallback in LLM_FALLBACK_CHAIN
+                if fallback != provider and fallback in available
+            )
+        return [
+            (name, name_model) for name, name_model in chain
+            if name not in self.breakers or self.breakers[name].ready()
+        ]
+    
+    async def prepare_messages(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        if history:
+            history = await self.compactor.compact(history)
+        return build_messages(prompt, system, history)
+    
+    async def _summarize_turns(self, turns: List[Dict[str, str]]) -> str:
+        result = await self.generate(
+            prompt=(
+                "Summarize this part of a conversation in a few sentences. Keep decisions, "
+                "requirements, file names and open questions; drop pleasantries.\n\n"
+                + truncate_turns(turns)
+            ),
+            max_tokens=LLM_SUMMARY_MAX_TOKENS,
+            temperature=0
+        )
+        if not result["success"]:
+            raise Exception(result["error"])
+        return result["response"]
+    
+    async def stream(
+        self,
+        prompt: str,
+        provider: str = "auto",
+        model: Optional[str] = None,
+        max_tokens: int = 2000,
+        temperature: float = 0.7,
+        system: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        user_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield token events followed by a single done (or error) event.
+        
+        Fails over to the next provider in the chain only while no token has
+        been sent; after that an error ends the stream.
+        """
+        streamers = {
+            "groq": self.stream_with_groq,
+            "gemini": self.stream_with_gemini,
+            "emergent": self.stream_with_emergent,
+            "openai": self.stream_with_openai
+        }
+        errors = []
+        started = time.perf_counter()
+        
+        try:
+            if provider == "auto" and not self.get_available_providers():
+                raise ValueError("No LLM provider configured")
+            if provider != "auto" and provider not in streamers:
+                raise ValueError(f"Unknown provider: {provider}")
+            
+            messages = await self.prepare_messages(prompt, system, history)
+            prompt_tokens = count_message_tokens(messages)
+            
+            for name, name_model in self.build_chain(provider, model):
+                if name not in streamers:
+                    errors.append(f"Unknown provider: {name}")
+                    continue
+                
+                try:
+                    await self.rate_limiter.acquire(
+                        name, name_model, prompt_tokens + max_tokens
+                    )
+                except RateLimitExceeded as e:
+                    errors.append(f"{name}: {str(e)}")
+                    continue
+                
+                # As in _generate, only configured providers have their
+                # failures counted against the breaker.
+                breaker = self.breakers[name] if name in self.get_available_providers() else None
+                if breaker and not breaker.allows():
+                    errors.append(f"{name}: circuit open")
+                    continue
+                completion_tokens = 0
+                try:
+                    async for text in streamers[name](messages, name_model, max_tokens, temperature):
+                        completion_tokens += estimate_tokens(text)
+                        yield {"type": "token", "text": text}
+                except Exception as e:
+                    if breaker:
+                        breaker.record_failure(str(e))
+                    if completion_tokens:
+                        raise
+                    errors.append(str(e))
+                    continue
+                except BaseException:
+                    if breaker:
+                        breaker.on_cancel()
+                    raise
+                
+                if breaker:
+                    breaker.record_success()
+                done = {
+                    "type": "done",
+                    "provider": name,
+                    "model": name_model,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens
+                }
+                self.meter.record(
+                    user_id, name, name_model, prompt_tokens, completion_tokens,
+                    (time.perf_counter() - started) * 1000
+                )
+                yield done
+                return
+            
+            raise Exception("; ".join(errors) or "All providers are unavailable (circuits open)")
+        except Exception as e:
+            self.meter.record(
+                user_id, provider, model, 0, 0, (time.perf_counter() - started) * 1000, success=False
+            )
+            yield {"type": "error", "error": str(e), "provider": provider}
+    
     async def generate(
         self,
         prompt: str,
         provider: str = "auto",
         model: Optional[str] = None,
         max_tokens: int = 2000,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        cache: bool = False,
+        hedge: Optional[bool] = None,
+        system: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        user_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        if provider == "auto":
-            if self.groq_client:
-                provider = "groq"
-            elif self.gemini_key:
-                provider = "gemini"
-            elif self.emergent_client:
-                provider = "emergent"
-            elif self.openai_client:
-                provider = "openai"
-            else:
-                raise ValueError("No LLM provider configured")
+        if hedge is None:
+            hedge = LLM_HEDGE_DEFAULT
+        
+        started = time.perf_counter()
+        messages = await self.prepare_messages(prompt, system, history)
+        
+        async def compute():
+            return await self._dispatch(messages, provider, model, max_tokens, temperature, hedge)
+        
+        if self.cache.is_cacheable(temperature, cache):
+            cache_prompt = prompt if len(messages) == 1 else json.dumps(messages)
+            key = make_cache_key(
+                provider, model or DEFAULT_MODELS.get(provider, ""), cache_prompt, max_tokens, temperature
+            )
+            result = await self.cache.get_or_compute(key, compute)
+        else:
+            result = await compute()
         
+        self._meter(user_id, result, time.perf_counter() - started)
+        return result
+    
+    def _meter(self, user_id: Optional[str], result: Dict[str, Any], latency: float):
+        usage = result.get("usage") or {}
+        cached = bool(result.get("cached"))
+        self.meter.record(
+            user_id=user_id,
+            provider=result.get("provider"),
+            model=result.get("model"),
+            # Cache hits cost no provider tokens.
+            prompt_tokens=0 if cached else usage.get("prompt_tokens", 0),
+            completion_tokens=0 if cached else usage.get("completion_tokens", 0),
+            latency_ms=latency * 1000,
+            success=result.get("success", False),
+            cached=cached
+        )
+    
+    async def generate_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        parallelism: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Run generations concurrently, yielding (index, result) as each finishes.
+        
+        Concurrency is capped per provider that actually serves a call (after
+        auto routing, fallback and hedging), so one batch can't monopolise a
+        provider's quota.
+        """
+        parallelism = parallelism or LLM_BATCH_PARALLELISM
+        semaphores: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(parallelism))
+        
+        async def run(index: int, request: Dict[str, Any]):
+            # Each task runs in its own context copy, so this stays local to it.
+            batch_semaphores.set(semaphores)
+            try:
+                result = await self.generate(**request)
+            except Exception as e:
+                result = {"success": False, "error": str(e), "provider": request.get("provider", "auto")}
+            return index, result
+        
+        tasks = [asyncio.ensure_future(run(index, request)) for index, request in enumerate(requests)]
         try:
-            if provider == "groq":
-                model = model or "mixtral-8x7b-32768"
-                response = await self.generate_with_groq(prompt, model, max_tokens, temperature)
-            elif provider == "gemini":
-                model = model or "gemini-pro"
-                response = await self.generate_with_gemini(prompt, model, max_tokens, temperature)
-            elif provider == "emergent":
-                model = model or "gpt-3.5-turbo"
-                response = await self.generate_with_emergent(prompt, model, max_tokens, temperature)
-            elif provider == "openai":
-                model = model or "gpt-3.5-turbo"
-                response = await self.generate_with_openai(prompt, model, max_tokens, temperature)
-            else:
-                raise ValueError(f"Unknown provider: {provider}")
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def _dispatch(
+        self,
+        messages: List[Dict[str, str]],
+        provider: str,
+        model: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        hedge: bool
+    ) -> Dict[str, Any]:
+        if provider == "auto" and not self.get_available_providers():
+            raise ValueError("No LLM provider configured")
+        # A typo must not be silently served by the fallback chain.
+        if provider != "auto" and provider not in DEFAULT_MODELS:
+            return {"success": False, "error": f"Unknown provider: {provider}", "provider": provider}
+        
+        chain = self.build_chain(provider, model)
+        tried = set()
+        errors = []
+        
+        if hedge and provider == "auto" and len(chain) > 1:
+            result = await self._generate_hedged(messages, chain[:2], max_tokens, temperature, tried)
+            if result["success"]:
+                return result
+            errors.append(result["error"])
+        
+        for name, name_model in chain:
+            if name in tried:
+                continue
+            # A breaker may have opened while earlier attempts were running.
+            if name in self.breakers and not self.breakers[name].ready():
+                continue
+            tried.add(name)
+            result = await self._generate(messages, name, name_model, max_tokens, temperature)
+            if result["success"]:
+                return result
+            errors.append(result["error"])
+        
+        return {
+            "success": False,
+            "error": "; ".join(errors) or "All providers are unavailable (circuits open)",
+            "provider": provider
+        }
+    
+    async def _generate_hedged(
+        self,
+        messages: List[Dict[str, str]],
+        candidates: List[Tuple[str, str]],
+        max_tokens: int,
+        temperature: float,
+        tried: set
+    ) -> Dict[str, Any]:
+        """Run the primary candidate and, if it hasn't answered by its p95
+        latency, race it against the next candidate. The loser is cancelled."""
+        (primary, primary_model), (secondary, secondary_model) = candidates[0], candidates[1]
+        tried.add(primary)
+        primary_task = asyncio.ensure_future(
+            self._generate(messages, primary, primary_model, max_tokens, temperature)
+        )
+        tasks = {primary_task}
+        
+        try:
+            delay = self.router.hedge_delay(primary, primary_model)
+            if delay is None:
+                return await primary_task
+            
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary_task.result()
             
+            tried.add(secondary)
+            tasks.add(asyncio.ensure_future(
+                self._generate(messages, secondary, secondary_model, max_tokens, temperature)
+            ))
+            pending = set(tasks)
+            result = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result["success"]:
+                        return result
+            return result
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        provider: str,
+        model: Optional[str],
+        max_tokens: int,
+        temperature: float
+    ) -> Dict[str, Any]:
+        semaphores = batch_semaphores.get()
+        if semaphores is None:
+            return await self._call_provider(messages, provider, model, max_tokens, temperature)
+        async with semaphores[provider]:
+            return await self._call_provider(messages, provider, model, max_tokens, temperature)
+    
+    async def _call_provider(
+        self,
+        messages: List[Dict[str, str]],
+        provider: str,
+        model: Optional[str],
+        max_tokens: int,
+        temperature: float
+    ) -> Dict[str, Any]:
+        generators = {
+            "groq": self.generate_with_groq,
+            "gemini": self.generate_with_gemini,
+            "emergent": self.generate_with_emergent,
+            "openai": self.generate_with_openai
+        }
+        if provider not in generators:
             return {
-                "success": True,
-                "response": response,
-                "provider": provider,
-                "model": model
+                "success": False,
+                "error": f"Unknown provider: {provider}",
+                "provider": provider
             }
-        except Exception as e:
+        
+        model = model or DEFAULT_MODELS[provider]
+        try:
+            await self.rate_limiter.acquire(provider, model, count_message_tokens(messages) + max_tokens)
+        except RateLimitExceeded as e:
+            # Local back-pressure, not a provider fault: don't touch the breaker.
+            return {
+                "success": False,
+                "error": f"{provider}: {str(e)}",
+                "provider": provider
+            }
+        
+        breaker = self.breakers[provider] if provider in self.get_available_providers() else None
+        # Claimed only now, after the rate-limiter wait, so a half-open
+        # breaker lets exactly one probe through.
+        if breaker and not breaker.allows():
             return {
                 "success": False,
-                "error": str(e),
+                "error": f"{provider}: circuit open",
                 "provider": provider
             }
+        
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                generators[provider](messages, model, max_tokens, temperature),
+                timeout=LLM_PROVIDER_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            error = f"{provider} timed out after {LLM_PROVIDER_TIMEOUT}s"
+        except Exception as e:
+            error = str(e)
+        except BaseException:
+            if breaker:
+                breaker.on_cancel()
+            raise
+        else:
+            latency = time.perf_counter() - started
+            self.router.record(provider, model, latency, True)
+            if breaker:
+                breaker.record_success()
+            prompt_tokens = response.prompt_tokens
+            if prompt_tokens is None:
+                prompt_tokens = count_message_tokens(messages)
+            completion_tokens = response.completion_tokens
+            if completion_tokens is None:
+                completion_tokens = estimate_tokens(response.text)
+            return {
+                "success": True,
+                "response": response.text,
+                "provider": provider,
+                "model": model,
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "latency_ms": round(latency * 1000, 1)
+                }
+            }
+        
+        self.router.record(provider, model, time.perf_counter() - started, False)
+        if breaker:
+            breaker.record_failure(error)
+        return {
+            "success": False,
+            "error": error,
+            "provider": provider
+        }
     
     def get_available_providers(self) -> List[str]:
         providers = []
@@ -0,0 +1,421 @@
+import os
+import json
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+from pagination import encode_cursor, decode_cursor
+from project_versions import VersionConflict
+
+LOCAL_DB_PATH = os.getenv("LOCAL_DB_PATH", "doveable_local.db")
+
+# Embedded storage used when MongoDB is not configured. Everything goes
+# through one SQLite connection in WAL mode, driven by a single worker
+# thread: statements never block the event loop and never interleave, and
+# each write method is one transaction. The repositories return the same
+# dict shapes as the Mongo ones in repositories.py.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    github_synced INTEGER NOT NULL DEFAULT 0,
+    github_repo_url TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS projects_created_at_id ON projects (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS projects_user_created_at_id ON projects (user_id, created_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS project_files (
+    project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (project_id, path)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS chat_histories (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    project_id TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS chat_histories_created_at_id ON chat_histories (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS chat_histories_user_created_at_id ON chat_histories (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS chat_histories_user_project_updated_at_id
+    ON chat_histories (user_id, project_id, updated_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    history_id TEXT NOT NULL REFERENCES chat_histories (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (history_id, seq)
+) WITHOUT ROWID;
+"""
+
+PROJECT_COLUMNS = {
+    "id": "id",
+    "userId": "user_id",
+    "name": "name",
+    "description": "description",
+    "created_at": "created_at",
+    "githubSynced": "github_synced",
+    "githubRepoUrl": "github_repo_url",
+    "version": "version"
+}
+
+HISTORY_COLUMNS = {
+    "id": "id",
+    "userId": "user_id",
+    "projectId": "project_id",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+    "messageCount": "message_count"
+}
+
+def row_to_document(row: sqlite3.Row, columns: Dict[str, str]) -> Dict[str, Any]:
+    document = {field: row[column] for field, column in columns.items()}
+    if "githubSynced" in document:
+        document["githubSynced"] = bool(document["githubSynced"])
+    return document
+
+def select_page(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: Dict[str, str],
+    filters: Dict[str, Any],
+    sort_field: str,
+    limit: int,
+    cursor: Optional[str]
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Keyset pagination newest-first on (sort_field, id), like pagination.fetch_page"""
+    sort_column = columns[sort_field]
+    clauses = [f"{columns[field]} = ?" for field in filters]
+    params: List[Any] = list(filters.values())
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        clauses.append(f"({sort_column} < ? OR ({sort_column} = ? AND id < ?))")
+        params.extend([value, value, last_id])
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(
+        f"SELECT * FROM {table} {where} ORDER BY {sort_column} DESC, id DESC LIMIT ?",
+        [*params, limit + 1]
+    ).fetchall()
+    documents = [row_to_document(row, columns) for row in rows]
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1], sort_field)
+    return documents, next_cursor
+
+def project_fields(documents: List[Dict[str, Any]], projection: Dict[str, int]) -> List[Dict[str, Any]]:
+    return [
+        {field: value for field, value in document.items() if projection.get(field)}
+        for document in documents
+    ]
+
+class LocalStore:
+    def __init__(self, path: str = LOCAL_DB_PATH):
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-store")
+        self.conn: Optional[sqlite3.Connection] = None
+        self.projects = LocalProjectRepository(self)
+        self.chat_histories = LocalChatHistoryRepository(self)
+
+    def open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SCHEMA)
+        self.conn = conn
+
+    async def run(self, fn, *args):
+        """Run fn(conn, *args) on the store's worker thread"""
+        def call():
+            if self.conn is None:
+                self.open()
+            return fn(self.conn, *args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    async def transaction(self, fn, *args):
+        """Run fn(conn, *args) inside BEGIN IMMEDIATE ... COMMIT"""
+        def call(conn, *args):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn, *args)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        return await self.run(call, *args)
+
+    async def close(self):
+        def close():
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+        await asyncio.get_running_loop().run_in_executor(self.executor, close)
+        self.executor.shutdown(wait=False)
+
+class LocalProjectRepository:
+    def __init__(self, store: LocalStore):
+        self.store = store
+
+    @staticmethod
+    def load_files(conn: sqlite3.Connection, project_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        files: Dict[str, Dict[str, Any]] = {project_id: {} for project_id in project_ids}
+        placeholders = ",".join("?" * len(project_ids))
+        rows = conn.execute(
+            f"SELECT project_id, path, content FROM project_files WHERE project_id IN ({placeholders})",
+            project_ids
+        )
+        for row in rows:
+            files[row["project_id"]][row["path"]] = json.loads(row["content"])
+        return files
+
+    async def list(
+        self,
+        user_id: Optional[str],
+        limit: int,
+        cursor: Optional[str],
+        projection: Dict[str, int]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        def list_projects(conn):
+            filters = {"userId": user_id} if user_id else {}
+            projects, next_cursor = select_page(
+                conn, "projects", PROJECT_COLUMNS, filters, "created_at", limit, cursor
+            )
+            if "files" in projection and projects:
+                files = self.load_files(conn, [project["id"] for project in projects])
+                for project in projects:
+                    project["files"] = files[project["id"]]
+            return project_fields(projects, projection), next_cursor
+        return await self.store.run(list_projects)
+
+    async def create(self, project: Dict[str, Any], files: Dict[str, Any]):
+        def create_project(conn):
+            conn.execute(
+                f"INSERT INTO projects ({', '.join(PROJECT_COLUMNS.values())}) "
+                f"VALUES ({', '.join('?' * len(PROJECT_COLUMNS))})",
+                [project.get(field) for field in PROJECT_COLUMNS]
+            )
+            conn.executemany(
+                "INSERT INTO project_files (project_id, path, content) VALUES (?, ?, ?)",
+                [(project["id"], path, json.dumps(content)) for path, content in files.items()]
+            )
+        await self.store.transaction(create_project)
+
+    async def get(self, project_id: str) -> Optional[Dict[str, Any]]:
+        def get_project(conn):
+            row = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+            if row is None:
+                return None
+            project = row_to_document(row, PROJECT_COLUMNS)
+            project["files"] = self.load_files(conn, [project_id])[project_id]
+            return project
+        return await self.store.run(get_project)
+
+    async def get_export(self, project_id: str) -> Optional[Dict[str, Any]]:
+        return await self.get(project_id)
+
+    async def delete(self, project_id: str) -> bool:
+        def delete_project(conn):
+            return conn.execute("DELETE FROM projects WHERE id = ?", (project_id,)).rowcount > 0
+        return await self.store.transaction(delete_project)
+
+    async def patch_files(
+        self,
+        project_id: str,
+        expected_version: int,
+        upsert: Dict[str, Any],
+        delete: List[str],
+        message: Optional[str] = None
+    ) -> Optional[Tuple[int, List[str], List[str]]]:
+        # The local backend keeps only the version counter, not the history;
+        # `message` is accepted for parity with the Mongo repository.
+        def patch(conn):
+            row = conn.execute("SELECT version FROM projects WHERE id = ?", (project_id,)).fetchone()
+            if row is None:
+                return None
+            if row["version"] != expected_version:
+                raise VersionConflict(f"Project is at version {row['version']}, not {expected_version}")
+
+            paths = list(upsert) + list(delete)
+            placeholders = ",".join("?" * len(paths))
+            existing = {
+                existing_row["path"]: existing_row["content"]
+                for existing_row in conn.execute(
+                    f"SELECT path, content FROM project_files WHERE project_id = ? AND path IN ({placeholders})",
+                    [project_id, *paths]
+                )
+            }
+            upserted = sorted(
+                path for path, content in upsert.items() if existing.get(path) != json.dumps(content)
+            )
+            deleted = sorted(path for path in delete if path in existing)
+            if not upserted and not deleted:
+                return row["version"], [], []
+
+            conn.executemany(
+                "INSERT INTO project_files (project_id, path, content) VALUES (?, ?, ?) "
+                "ON CONFLICT (project_id, path) DO UPDATE SET content = excluded.content",
+                [(project_id, path, json.dumps(upsert[path])) for path in upserted]
+            )
+            conn.executemany(
+                "DELETE FROM project_files WHERE project_id = ? AND path = ?",
+                [(project_id, path) for path in deleted]
+            )
+            conn.execute("UPDATE projects SET version = version + 1 WHERE id = ?", (project_id,))
+            return row["version"] + 1, upserted, deleted
+        return await self.store.transaction(patch)
+
+class LocalChatHistoryRepository:
+    def __init__(self, store: LocalStore):
+        self.store = store
+
+    @staticmethod
+    def insert_messages(conn: sqlite3.Connection, history_id: str, start: int, messages: List[Dict[str, Any]]):
+        conn.executemany(
+            "INSERT INTO chat_messages (history_id, seq, message) VALUES (?, ?, ?)",
+            [(history_id, start + offset, json.dumps(message)) for offset, message in enumerate(messages)]
+        )
+
+    @staticmethod
+    def load_messages(conn: sqlite3.Connection, history_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        messages: Dict[str, List[Dict[str, Any]]] = {history_id: [] for history_id in history_ids}
+        placeholders = ",".join("?" * len(history_ids))
+        rows = conn.execute(
+            f"SELECT history_id, message FROM chat_messages WHERE history_id IN ({placeholders}) "
+            "ORDER BY history_id, seq",
+            history_ids
+        )
+        for row in rows:
+            messages[row["history_id"]].append(json.loads(row["message"]))
+        return messages
+
+    async def list(
+        self,
+        filters: Dict[str, Any],
+        sort_field: str,
+        limit: int,
+        cursor: Optional[str],
+        projection: Dict[str, int]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        def list_histories(conn):
+            histories, next_cursor = select_page(
+                conn, "chat_histories", HISTORY_COLUMNS, filters, sort_field, limit, cursor
+            )
+            if "messages" in projection and histories:
+                messages = self.load_messages(conn, [history["id"] for history in histories])
+                for history in histories:
+                    history["messages"] = messages[history["id"]]
+            return project_fields(histories, projection), next_cursor
+        return await self.store.run(list_histories)
+
+    async def create(self, history: Dict[str, Any], messages: List[Dict[str, Any]]):
+        def create_history(conn):
+            conn.execute(
+                f"INSERT INTO chat_histories ({', '.join(HISTORY_COLUMNS.values())}) "
+                f"VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})",
+                [history.get(field) for field in HISTORY_COLUMNS]
+            )
+            self.insert_messages(conn, history["id"], 0, messages)
+        await self.store.transaction(create_history)
+
+    async def get(self, history_id: str) -> Optional[Dict[str, Any]]:
+        def get_history(conn):
+            row = conn.execute("SELECT * FROM chat_histories WHERE id = ?", (history_id,)).fetchone()
+            if row is None:
+                return None
+            history = row_to_document(row, HISTORY_COLUMNS)
+            history["messages"] = self.load_messages(conn, [history_id])[history_id]
+            return history
+        return await self.store.run(get_history)
+
+    async def replace_messages(
+        self,
+        history_id: str,
+        messages: List[Dict[str, Any]],
+        updated_at: str
+    ) -> Optional[Dict[str, Any]]:
+        def replace(conn):
+            updated = conn.execute(
+                "UPDATE chat_histories SET message_count = ?, updated_at = ? WHERE id = ?",
+                (len(messages), updated_at, history_id)
+            )
+            if updated.rowcount == 0:
+                return None
+            conn.execute("DELETE FROM chat_messages WHERE history_id = ?", (history_id,))
+            self.insert_messages(conn, history_id, 0, messages)
+            row = conn.execute("SELECT * FROM chat_histories WHERE id = ?", (history_id,)).fetchone()
+            return {**row_to_document(row, HISTORY_COLUMNS), "messages": messages}
+        return await self.store.transaction(replace)
+
+    async def append(
+        self,
+        history_id: str,
+        messages: List[Dict[str, Any]],
+        updated_at: str
+    ) -> Optional[Dict[str, Any]]:
+        def append_messages(conn):
+            row = conn.execute("SELECT * FROM chat_histories WHERE id = ?", (history_id,)).fetchone()
+            if row is None:
+                return None
+            history = row_to_document(row, HISTORY_COLUMNS)
+            self.insert_messages(conn, history_id, history["messageCount"], messages)
+            history["messageCount"] += len(messages)
+            history["updated_at"] = updated_at
+            conn.execute(
+                "UPDATE chat_histories SET message_count = ?, updated_at = ? WHERE id = ?",
+                (history["messageCount"], updated_at, history_id)
+            )
+            return history
+        return await self.store.transaction(append_messages)
+
+    async def read_page(
+        self,
+        history_id: str,
+        before: Optional[int],
+        limit: int
+    ) -> Optional[Tuple[List[Dict[str, Any]], int, int]]:
+        def page(conn):
+            row = conn.execute("SELECT message_count FROM chat_histories WHERE id = ?", (history_id,)).fetchone()
+            if row is None:
+                return None
+            count = row["message_count"]
+            end = count if before is None else min(before, count)
+            start = max(0, end - limit)
+            rows = conn.execute(
+                "SELECT message FROM chat_messages WHERE history_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (history_id, start, end)
+            )
+            return [json.loads(message_row["message"]) for message_row in rows], start, count
+        return await self.store.run(page)
+
+    async def delete(self, history_id: str) -> bool:
+        def delete_history(conn):
+            return conn.execute("DELETE FROM chat_histories WHERE id = ?", (history_id,)).rowcount > 0
+        return await self.store.transaction(delete_history)
+
+local_store: Optional[LocalStore] = None
+
+def get_local_store() -> LocalStore:
+    global local_store
+    if local_store is None:
+        local_store = LocalStore()
+    return local_store
+
+async def close_local_store():
+    global local_store
+    if local_store is not None:
+        await local_store.close()
+        local_store = None
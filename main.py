@@ -4,20 +4,34 @@ from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 
-from routes.llm_routes import router as llm_router
+from routes.llm_routes import router as llm_router, llm_service
 from routes.project_routes import router as project_router
 from routes.chat_history_routes import router as chat_history_router
 from routes.auth_routes import router as auth_router
 from routes.github_sync_routes import router as github_sync_router
+from routes.usage_routes import router as usage_router
+from routes.admin_routes import router as admin_router
+from routes.search_routes import router as search_router
 from database import connect_to_mongo, close_mongo_connection
+from github_jobs import github_sync_jobs
+from local_store import close_local_store
+from http_client import outbound_http
+from usage import usage_meter
 
 load_dotenv()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_to_mongo()
+    await usage_meter.start()
+    await github_sync_jobs.start()
     yield
+    await github_sync_jobs.stop()
+    await usage_meter.stop()
+    await llm_service.close()
+    await outbound_http.close()
     await close_mongo_connection()
+    await close_local_store()
 
 app = FastAPI(
     title="Doveable AI Backend",
@@ -34,6 +48,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(llm_router)
@@ -41,6 +56,9 @@ app.include_router(project_router)
 app.include_router(chat_history_router)
 app.include_router(auth_router)
 app.include_router(github_sync_router)
+app.include_router(usage_router)
+app.include_router(admin_router)
+app.include_router(search_router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,83 @@
+import json
+import base64
+from fastapi import HTTPException
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str) -> str:
+    raw = json.dumps([doc[sort_field], doc["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value, last_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def build_projection(
+    fields: Optional[str],
+    allowed: Iterable[str],
+    always: Iterable[str],
+    summary_excluded: Iterable[str]
+) -> Dict[str, int]:
+    """Inclusion projection for a listing.
+    
+    Without `fields`, every allowed field except the heavy `summary_excluded`
+    ones is returned. With `fields` (comma separated), only those plus the
+    `always` fields (required by the schema and the cursor) are returned.
+    """
+    allowed = set(allowed)
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - allowed
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        selected = requested | set(always)
+    else:
+        selected = allowed - set(summary_excluded)
+    
+    projection = {field: 1 for field in selected}
+    projection["_id"] = 0
+    return projection
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort_field: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, int]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Keyset pagination newest-first on (sort_field, id).
+    
+    Each page is a single index range scan of limit + 1 documents, no
+    matter how deep into the listing the cursor points.
+    """
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        query = {
+            "$and": [
+                query,
+                {"$or": [
+                    {sort_field: {"$lt": value}},
+                    {sort_field: value, "id": {"$lt": last_id}}
+                ]}
+            ]
+        }
+    
+    docs = await (
+        collection.find(query, projection)
+        .sort([(sort_field, -1), ("id", -1)])
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+    
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
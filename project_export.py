@@ -0,0 +1,80 @@
+import os
+import zipfile
+from datetime import datetime
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
+from blob_store import file_content_text, iter_manifest_files, manifest_etag, project_manifest
+
+EXPORT_COMPRESSION_LEVEL = int(os.getenv("EXPORT_COMPRESSION_LEVEL", "6"))
+EXPORT_BLOB_BATCH_SIZE = int(os.getenv("EXPORT_BLOB_BATCH_SIZE", "50"))
+
+# ZIP export streams the archive while it is written: zipfile writes into a
+# non-seekable buffer, and the buffer is drained to the client after every
+# file. Blobs are read in small batches, so memory is bounded by one batch
+# plus the largest file, whatever the size of the project.
+
+class ZipStreamBuffer:
+    """Write-only sink for zipfile; without tell()/seek() zipfile writes a
+    streamable archive and never goes back to patch headers"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def export_etag(project: Dict[str, Any], level: int) -> str:
+    # The compression level changes the bytes, so it is part of the tag.
+    return f'"{manifest_etag(project_manifest(project))}-{level}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+def archive_timestamp(project: Dict[str, Any]) -> Tuple[int, int, int, int, int, int]:
+    # A fixed per-project timestamp keeps the archive bytes (and ETag) stable.
+    try:
+        created = datetime.fromisoformat(project.get("created_at", ""))
+    except ValueError:
+        return (1980, 1, 1, 0, 0, 0)
+    return max(created, datetime(1980, 1, 1)).timetuple()[:6]
+
+async def iter_project_files(db, project: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    if "manifest" not in project:
+        files = project.get("files") or {}
+        for path in sorted(files):
+            yield path, files[path]
+        return
+
+    async for path, content in iter_manifest_files(db, project["manifest"], EXPORT_BLOB_BATCH_SIZE):
+        yield path, content
+
+async def stream_project_zip(db, project: Dict[str, Any], level: int) -> AsyncIterator[bytes]:
+    """Yield a ZIP archive of the project's files chunk by chunk"""
+    buffer = ZipStreamBuffer()
+    compression = zipfile.ZIP_DEFLATED if level > 0 else zipfile.ZIP_STORED
+    timestamp = archive_timestamp(project)
+
+    with zipfile.ZipFile(buffer, "w", compression=compression, compresslevel=level or None) as archive:
+        async for path, content in iter_project_files(db, project):
+            info = zipfile.ZipInfo(path.lstrip("/"), date_time=timestamp)
+            info.compress_type = compression
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, file_content_text(content).encode(), compresslevel=level or None)
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+
+    chunk = buffer.drain()
+    if chunk:
+        yield chunk
@@ -1,20 +1,54 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response, Header
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from datetime import datetime
+import re
 import uuid
-from schemas import ProjectSchema, CreateProjectRequest
+from schemas import (
+    ProjectSchema,
+    CreateProjectRequest,
+    CreateProjectVersionRequest,
+    PatchProjectFilesRequest,
+    PatchProjectFilesResponse,
+    ProjectVersionSummarySchema,
+    ProjectVersionSchema,
+    ProjectDiffSchema
+)
 from database import get_database
+from pagination import build_projection
+from blob_store import resolve_manifests, decode_path
+from search_index import index_project_changes
+from repositories import get_project_repository
+from project_export import EXPORT_COMPRESSION_LEVEL, export_etag, etag_matches, stream_project_zip
+from project_versions import (
+    VersionConflict,
+    commit_files,
+    get_version_manifest,
+    list_versions,
+    diff_manifests
+)
 
 router = APIRouter(prefix="/api/projects", tags=["Projects"])
 
+PROJECT_FIELDS = list(ProjectSchema.model_fields)
+PROJECT_REQUIRED_FIELDS = ["id", "name", "description", "created_at"]
+
 @router.get("/", response_model=List[ProjectSchema])
-async def get_projects():
-    db = get_database()
-    if not db:
-        return []
+async def get_projects(
+    response: Response,
+    userId: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """List projects newest first. Files are left out unless requested via
+    fields=; pass the X-Next-Cursor response header back as cursor for the
+    next page."""
+    projection = build_projection(fields, PROJECT_FIELDS, PROJECT_REQUIRED_FIELDS, ["files"])
+    projects, next_cursor = await get_project_repository().list(userId, limit, cursor, projection)
     
-    projects_collection = db.projects
-    projects = await projects_collection.find().to_list(100)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return [ProjectSchema(**project) for project in projects]
 
@@ -27,31 +61,20 @@ async def create_project(project: CreateProjectRequest):
         "id": project_id,
         "name": project.name,
         "description": project.description,
-        "files": project.files,
         "created_at": created_at,
         "userId": project.userId,
         "githubSynced": False,
-        "githubRepoUrl": None
+        "githubRepoUrl": None,
+        "version": 1
     }
     
-    db = get_database()
-    if db:
-        projects_collection = db.projects
-        await projects_collection.insert_one(project_dict)
+    await get_project_repository().create(project_dict, project.files)
     
-    return ProjectSchema(**project_dict)
+    return ProjectSchema(**project_dict, files=project.files)
 
 @router.get("/{project_id}", response_model=ProjectSchema)
 async def get_project(project_id: str):
-    db = get_database()
-    if not db:
-        raise HTTPException(
-            status_code=404, 
-            detail="Project not found. Database is not connected. Projects are not persisted without MongoDB."
-        )
-    
-    projects_collection = db.projects
-    project = await projects_collection.find_one({"id": project_id})
+    project = await get_project_repository().get(project_id)
     
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -60,17 +83,147 @@ async def get_project(project_id: str):
 
 @router.delete("/{project_id}")
 async def delete_project(project_id: str):
-    db = get_database()
-    if not db:
+    if not await get_project_repository().delete(project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    return {"message": "Project deleted successfully"}
+
+async def find_project(db, project_id: str, projection: dict = None) -> dict:
+    if db is None:
         raise HTTPException(
             status_code=404,
-            detail="Project not found. Database is not connected. Projects are not persisted without MongoDB."
+            detail="Project version history is only available with MongoDB."
         )
     
-    projects_collection = db.projects
-    result = await projects_collection.delete_one({"id": project_id})
+    project = await db.projects.find_one({"id": project_id}, projection)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+async def find_version_manifest(db, project_id: str, version: int) -> dict:
+    manifest = await get_version_manifest(db, project_id, version)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail=f"Version {version} not found")
+    return manifest
+
+@router.get("/{project_id}/export.zip")
+async def export_project_zip(
+    project_id: str,
+    level: int = Query(EXPORT_COMPRESSION_LEVEL, ge=0, le=9),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Download the project's files as a ZIP archive streamed while it is
+    built; level=0 stores files uncompressed"""
+    project = await get_project_repository().get_export(project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    etag = export_etag(project, level)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
     
-    if result.deleted_count == 0:
+    filename = re.sub(r"[^A-Za-z0-9._-]+", "-", project.get("name") or "").strip("-.") or project_id
+    return StreamingResponse(
+        stream_project_zip(get_database(), project, level),
+        media_type="application/zip",
+        headers={
+            "ETag": etag,
+            "Content-Disposition": f'attachment; filename="{filename}.zip"',
+            "Cache-Control": "no-cache"
+        }
+    )
+
+@router.get("/{project_id}/versions", response_model=List[ProjectVersionSummarySchema])
+async def get_project_versions(
+    project_id: str,
+    limit: int = Query(50, ge=1, le=100),
+    before: Optional[int] = None
+):
+    """List versions newest first; pass the last version number as before= for the next page"""
+    db = get_database()
+    await find_project(db, project_id, {"id": 1})
+    versions = await list_versions(db, project_id, limit, before)
+    return [ProjectVersionSummarySchema(**version) for version in versions]
+
+@router.post("/{project_id}/versions", response_model=ProjectVersionSummarySchema)
+async def create_project_version(project_id: str, request: CreateProjectVersionRequest):
+    """Save the project's full file set as a new version; unchanged files cost nothing"""
+    db = get_database()
+    project = await find_project(db, project_id)
+    
+    try:
+        version, changes = await commit_files(db, project, request.files, request.message)
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    await index_project_changes(db, project, changes, request.files)
+    
+    return ProjectVersionSummarySchema(
+        version=version,
+        created_at=datetime.utcnow().isoformat(),
+        message=request.message,
+        changedCount=len(changes)
+    )
+
+@router.patch("/{project_id}/files", response_model=PatchProjectFilesResponse)
+async def patch_project_files(project_id: str, request: PatchProjectFilesRequest):
+    """Upsert and delete individual files as one new version. Fails with 409
+    unless expectedVersion is still the current version."""
+    if not request.upsert and not request.delete:
+        raise HTTPException(status_code=400, detail="Patch must upsert or delete at least one file")
+    if set(request.upsert) & set(request.delete):
+        raise HTTPException(status_code=400, detail="A path cannot be both upserted and deleted")
+    
+    try:
+        result = await get_project_repository().patch_files(
+            project_id, request.expectedVersion, request.upsert, request.delete, request.message
+        )
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if result is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    return {"message": "Project deleted successfully"}
+    version, upserted, deleted = result
+    return PatchProjectFilesResponse(projectId=project_id, version=version, upserted=upserted, deleted=deleted)
+
+@router.get("/{project_id}/versions/{version}", response_model=ProjectVersionSchema)
+async def get_project_version(project_id: str, version: int):
+    db = get_database()
+    await find_project(db, project_id, {"id": 1})
+    manifest = await find_version_manifest(db, project_id, version)
+    files = (await resolve_manifests(db, [manifest]))[0]
+    return ProjectVersionSchema(projectId=project_id, version=version, files=files)
+
+@router.get("/{project_id}/versions/{from_version}/diff/{to_version}", response_model=ProjectDiffSchema)
+async def diff_project_versions(
+    project_id: str,
+    from_version: int,
+    to_version: int,
+    content: bool = False
+):
+    """Paths added, removed and modified between two versions; content=true
+    also returns the new content of added and modified files"""
+    db = get_database()
+    await find_project(db, project_id, {"id": 1})
+    old = await find_version_manifest(db, project_id, from_version)
+    new = await find_version_manifest(db, project_id, to_version)
+    
+    changes = diff_manifests(old, new)
+    added = sorted(decode_path(key) for key, digest in changes.items() if digest and key not in old)
+    removed = sorted(decode_path(key) for key, digest in changes.items() if digest is None)
+    modified = sorted(decode_path(key) for key, digest in changes.items() if digest and key in old)
+    
+    files = None
+    if content:
+        files = (await resolve_manifests(db, [new], added + modified))[0]
+    
+    return ProjectDiffSchema(
+        projectId=project_id,
+        fromVersion=from_version,
+        toVersion=to_version,
+        added=added,
+        removed=removed,
+        modified=modified,
+        files=files
+    )
@@ -0,0 +1,220 @@
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+from pymongo.errors import DuplicateKeyError
+from blob_store import build_blobs, store_blobs, release_blobs, put_files
+
+PROJECT_SNAPSHOT_INTERVAL = int(os.getenv("PROJECT_SNAPSHOT_INTERVAL", "20"))
+
+# Project history lives in `project_versions`. Each version stores only the
+# paths it changed (encoded path -> blob hash, or None when deleted), and
+# every PROJECT_SNAPSHOT_INTERVAL-th version also stores the full manifest.
+# Reading a version replays at most one interval of deltas on top of the
+# nearest snapshot. Every hash a version introduces holds a blob reference,
+# so snapshots never point at blobs that have been garbage collected.
+
+class VersionConflict(Exception):
+    pass
+
+def diff_manifests(old: Dict[str, Optional[str]], new: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """Changes turning `old` into `new`: changed/added keys map to the new hash, removed keys to None"""
+    changes = {key: digest for key, digest in new.items() if old.get(key) != digest}
+    changes.update({key: None for key in old if key not in new})
+    return changes
+
+def apply_changes(manifest: Dict[str, str], changes: Dict[str, Optional[str]]) -> Dict[str, str]:
+    result = dict(manifest)
+    for key, digest in changes.items():
+        if digest is None:
+            result.pop(key, None)
+        else:
+            result[key] = digest
+    return result
+
+async def ensure_manifest(db, project: Dict[str, Any]) -> Dict[str, str]:
+    """Manifest of a project, moving legacy inline files into the blob store first"""
+    if "manifest" in project:
+        return project["manifest"]
+    
+    manifest = await put_files(db, project.get("files") or {})
+    result = await db.projects.update_one(
+        {"id": project["id"], "manifest": {"$exists": False}},
+        {"$set": {"manifest": manifest}, "$unset": {"files": ""}}
+    )
+    if result.modified_count == 0:
+        # Someone else migrated it first; drop our references and use theirs.
+        await release_blobs(db, manifest.values())
+        current = await db.projects.find_one({"id": project["id"]}, {"manifest": 1})
+        manifest = (current or {}).get("manifest", {})
+    project["manifest"] = manifest
+    return manifest
+
+async def insert_version(
+    db,
+    project_id: str,
+    version: int,
+    changes: Dict[str, Optional[str]],
+    snapshot: Optional[Dict[str, str]],
+    message: Optional[str] = None
+):
+    doc = {
+        "projectId": project_id,
+        "version": version,
+        "created_at": datetime.utcnow().isoformat(),
+        "message": message,
+        "changes": changes,
+        "changedCount": len(changes),
+        "isSnapshot": snapshot is not None
+    }
+    if snapshot is not None:
+        doc["snapshot"] = snapshot
+    await db.project_versions.insert_one(doc)
+
+def is_snapshot_version(version: int) -> bool:
+    return version == 1 or (version - 1) % PROJECT_SNAPSHOT_INTERVAL == 0
+
+async def create_initial_version(db, project_id: str, files: Dict[str, Any]) -> Dict[str, str]:
+    """Store a new project's files as version 1 and return its manifest"""
+    manifest, bodies = build_blobs(files)
+    # One reference for the version entry, one for the project manifest.
+    references = Counter(manifest.values())
+    await store_blobs(db, bodies, references + references)
+    await insert_version(db, project_id, 1, dict(manifest), manifest, "Initial version")
+    return manifest
+
+async def commit_changes(
+    db,
+    project: Dict[str, Any],
+    changes: Dict[str, Optional[str]],
+    bodies: Dict[str, bytes],
+    message: Optional[str] = None
+) -> Tuple[int, Dict[str, Optional[str]]]:
+    """Apply `changes` to the project manifest as a new version.
+    
+    `project` needs `id` and `version`, plus at least the manifest entries
+    for the changed paths (a partial manifest projection is fine). The
+    manifest is updated with per-path $set/$unset guarded by the version
+    counter; if another writer got there first nothing is kept and
+    VersionConflict is raised. Work is proportional to the changed paths,
+    except on snapshot versions, which read the full manifest once.
+    """
+    base_version = project.get("version", 0)
+    base_manifest = await ensure_manifest(db, project)
+    if base_version == 0:
+        # First recorded version: make it a full delta from empty so that
+        # every hash in the history is owned by a version.
+        changes = diff_manifests({}, apply_changes(base_manifest, changes))
+    
+    new_version = base_version + 1
+    snapshot = None
+    if is_snapshot_version(new_version):
+        if base_version:
+            current = await db.projects.find_one({"id": project["id"]}, {"manifest": 1, "version": 1})
+            if not current or current.get("version") != base_version:
+                raise VersionConflict(f"Project was modified concurrently (version {base_version} is stale)")
+            base_manifest = {**current.get("manifest", {}), **base_manifest}
+        snapshot = apply_changes(base_manifest, changes)
+    
+    added = Counter(digest for digest in changes.values() if digest is not None)
+    # One reference for the version entry, one for the project manifest.
+    project_refs = Counter(
+        digest for key, digest in changes.items()
+        if digest is not None and base_manifest.get(key) != digest
+    )
+    await store_blobs(db, bodies, added + project_refs)
+    
+    try:
+        await insert_version(db, project["id"], new_version, changes, snapshot, message)
+    except DuplicateKeyError:
+        await release_blobs(db, (added + project_refs).elements())
+        raise VersionConflict(f"Project was modified concurrently (version {base_version} is stale)")
+    
+    update: Dict[str, Any] = {
+        "$set": {
+            **{f"manifest.{key}": digest for key, digest in changes.items() if digest is not None},
+            "version": new_version
+        }
+    }
+    removed = {f"manifest.{key}": "" for key, digest in changes.items() if digest is None}
+    if removed:
+        update["$unset"] = removed
+    
+    result = await db.projects.update_one(
+        {"id": project["id"], "version": base_version if base_version else {"$in": [0, None]}},
+        update
+    )
+    if result.matched_count == 0:
+        await db.project_versions.delete_one({"projectId": project["id"], "version": new_version})
+        await release_blobs(db, (added + project_refs).elements())
+        raise VersionConflict(f"Project was modified concurrently (version {base_version} is stale)")
+    
+    replaced = [
+        base_manifest[key] for key, digest in changes.items()
+        if key in base_manifest and base_manifest[key] != digest
+    ]
+    await release_blobs(db, replaced)
+    return new_version, changes
+
+async def commit_files(
+    db,
+    project: Dict[str, Any],
+    files: Dict[str, Any],
+    message: Optional[str] = None
+) -> Tuple[int, Dict[str, Optional[str]]]:
+    """Record a full file set as a new version, storing only what changed"""
+    base_manifest = await ensure_manifest(db, project)
+    new_manifest, bodies = build_blobs(files)
+    changes = diff_manifests(base_manifest, new_manifest)
+    if not changes and project.get("version"):
+        return project["version"], {}
+    
+    changed_hashes = set(changes.values())
+    bodies = {digest: data for digest, data in bodies.items() if digest in changed_hashes}
+    version, _ = await commit_changes(db, project, changes, bodies, message)
+    return version, changes
+
+async def get_version_manifest(db, project_id: str, version: int) -> Optional[Dict[str, str]]:
+    snapshot = await db.project_versions.find_one(
+        {"projectId": project_id, "version": {"$lte": version}, "isSnapshot": True},
+        {"version": 1, "snapshot": 1},
+        sort=[("version", -1)]
+    )
+    if not snapshot:
+        return None
+    
+    manifest = dict(snapshot["snapshot"])
+    if snapshot["version"] == version:
+        return manifest
+    
+    found = snapshot["version"]
+    cursor = db.project_versions.find(
+        {"projectId": project_id, "version": {"$gt": snapshot["version"], "$lte": version}},
+        {"version": 1, "changes": 1}
+    ).sort("version", 1)
+    async for delta in cursor:
+        manifest = apply_changes(manifest, delta["changes"])
+        found = delta["version"]
+    
+    return manifest if found == version else None
+
+async def list_versions(
+    db,
+    project_id: str,
+    limit: int = 50,
+    before: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    query: Dict[str, Any] = {"projectId": project_id}
+    if before is not None:
+        query["version"] = {"$lt": before}
+    return await db.project_versions.find(
+        query,
+        {"_id": 0, "version": 1, "created_at": 1, "message": 1, "changedCount": 1}
+    ).sort("version", -1).limit(limit).to_list(limit)
+
+async def delete_versions(db, project_id: str):
+    hashes = []
+    async for version in db.project_versions.find({"projectId": project_id}, {"changes": 1}):
+        hashes.extend(digest for digest in version["changes"].values() if digest is not None)
+    await db.project_versions.delete_many({"projectId": project_id})
+    await release_blobs(db, hashes)
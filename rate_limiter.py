@@ -0,0 +1,140 @@
+import os
+import time
+import asyncio
+from typing import Dict, Any, Tuple
+
+LLM_ADMISSION_QUEUE_SIZE = int(os.getenv("LLM_ADMISSION_QUEUE_SIZE", "100"))
+LLM_ADMISSION_TIMEOUT = float(os.getenv("LLM_ADMISSION_TIMEOUT", "30"))
+
+class RateLimitExceeded(Exception):
+    pass
+
+def get_provider_limits(provider: str) -> Tuple[int, int]:
+    """Requests and tokens per minute for a provider, e.g. GROQ_RPM / GROQ_TPM (0 = unlimited)"""
+    prefix = provider.upper()
+    return (
+        int(os.getenv(f"{prefix}_RPM", "0")),
+        int(os.getenv(f"{prefix}_TPM", "0"))
+    )
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def time_until(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+    
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+class ProviderLimiter:
+    """Request and token budgets for one provider/model pair.
+    
+    Callers queue on an asyncio.Lock, which wakes waiters in FIFO order, so
+    a large request at the head of the queue can't be starved by small ones
+    behind it. The queue is bounded and every wait has a deadline.
+    """
+    
+    def __init__(self, rpm: int, tpm: int, max_queue: int = LLM_ADMISSION_QUEUE_SIZE):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_queue = max_queue
+        self.lock = asyncio.Lock()
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def _time_until(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.time_until(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.time_until(tokens))
+        return wait
+    
+    async def acquire(self, tokens: int, timeout: float = LLM_ADMISSION_TIMEOUT):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise RateLimitExceeded("Admission queue is full")
+        
+        started = time.monotonic()
+        deadline = started + timeout
+        self.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(self.lock.acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise RateLimitExceeded(f"Timed out after {timeout}s waiting for rate limit capacity")
+            
+            try:
+                while True:
+                    wait = self._time_until(tokens)
+                    if wait <= 0:
+                        break
+                    if time.monotonic() + wait > deadline:
+                        self.rejected += 1
+                        raise RateLimitExceeded(
+                            f"Rate limit capacity not available within {timeout}s"
+                        )
+                    await asyncio.sleep(wait)
+                
+                if self.requests:
+                    self.requests.consume(1)
+                if self.tokens:
+                    self.tokens.consume(tokens)
+            finally:
+                self.lock.release()
+        finally:
+            self.waiting -= 1
+        
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "rpm": int(self.requests.capacity) if self.requests else None,
+            "tpm": int(self.tokens.capacity) if self.tokens else None,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1)
+        }
+
+class RateLimiter:
+    def __init__(self):
+        self.limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+    
+    async def acquire(self, provider: str, model: str, tokens: int):
+        key = (provider, model)
+        if key not in self.limiters:
+            rpm, tpm = get_provider_limits(provider)
+            if not rpm and not tpm:
+                return
+            self.limiters[key] = ProviderLimiter(rpm, tpm)
+        await self.limiters[key].acquire(tokens)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            f"{provider}:{model}": limiter.snapshot()
+            for (provider, model), limiter in self.limiters.items()
+        }
@@ -0,0 +1,209 @@
+from typing import Optional, Dict, Any, List, Tuple
+from pymongo import ReturnDocument
+from database import get_database
+from pagination import fetch_page
+from blob_store import release_blobs, resolve_manifests, load_project_files, build_blobs, encode_path, decode_path
+from project_versions import VersionConflict, create_initial_version, commit_changes, delete_versions
+from chat_messages import (
+    attach_messages,
+    write_messages,
+    replace_messages,
+    delete_messages,
+    migrate_history,
+    append_messages,
+    read_page
+)
+from search_index import index_project, index_project_changes, remove_project, index_chat_messages, remove_chat
+from local_store import get_local_store
+
+# Storage behind project_routes and chat_history_routes. The Mongo
+# repositories are used whenever MongoDB is connected; otherwise the routes
+# get the embedded SQLite ones from local_store, which implement the same
+# methods. Version history, search and GitHub sync stay MongoDB-only.
+
+class MongoProjectRepository:
+    def __init__(self, db):
+        self.db = db
+
+    async def list(
+        self,
+        user_id: Optional[str],
+        limit: int,
+        cursor: Optional[str],
+        projection: Dict[str, int]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = {"userId": user_id} if user_id else {}
+        projection = dict(projection)
+        if "files" in projection:
+            projection["manifest"] = 1
+        projects, next_cursor = await fetch_page(self.db.projects, query, "created_at", limit, cursor, projection)
+
+        if "files" in projection:
+            # Resolve every manifest on the page with shared blob fetches.
+            with_manifest = [project for project in projects if "manifest" in project]
+            resolved = await resolve_manifests(self.db, [project["manifest"] for project in with_manifest])
+            for project, files in zip(with_manifest, resolved):
+                project["files"] = files
+        return projects, next_cursor
+
+    async def create(self, project: Dict[str, Any], files: Dict[str, Any]):
+        document = {**project, "manifest": await create_initial_version(self.db, project["id"], files)}
+        await self.db.projects.insert_one(document)
+        await index_project(self.db, project, files)
+
+    async def get(self, project_id: str) -> Optional[Dict[str, Any]]:
+        project = await self.db.projects.find_one({"id": project_id})
+        if project:
+            project["files"] = await load_project_files(self.db, project)
+        return project
+
+    async def get_export(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Project fields needed by project_export, with files left in the blob store"""
+        return await self.db.projects.find_one(
+            {"id": project_id},
+            {"id": 1, "name": 1, "created_at": 1, "manifest": 1, "files": 1}
+        )
+
+    async def delete(self, project_id: str) -> bool:
+        project = await self.db.projects.find_one_and_delete({"id": project_id}, {"manifest": 1})
+        if not project:
+            return False
+
+        await release_blobs(self.db, project.get("manifest", {}).values())
+        await delete_versions(self.db, project_id)
+        await remove_project(self.db, project_id)
+        return True
+
+    async def patch_files(
+        self,
+        project_id: str,
+        expected_version: int,
+        upsert: Dict[str, Any],
+        delete: List[str],
+        message: Optional[str] = None
+    ) -> Optional[Tuple[int, List[str], List[str]]]:
+        """Apply per-path upserts and deletes as one new version; returns
+        (version, upserted, deleted) for the paths that changed, or None if
+        the project does not exist"""
+        upsert_keys = {encode_path(path) for path in upsert}
+        delete_keys = {encode_path(path) for path in delete}
+
+        # Only the touched manifest entries are read, so the cost of a patch
+        # does not grow with the size of the project.
+        projection = {"id": 1, "userId": 1, "version": 1, **{f"manifest.{key}": 1 for key in upsert_keys | delete_keys}}
+        project = await self.db.projects.find_one({"id": project_id}, projection)
+        if project and "version" not in project:
+            # Projects without history are migrated from their full file set.
+            project = await self.db.projects.find_one({"id": project_id})
+        if not project:
+            return None
+
+        current_version = project.get("version", 0)
+        if current_version != expected_version:
+            raise VersionConflict(f"Project is at version {current_version}, not {expected_version}")
+
+        manifest = project.get("manifest", {})
+        new_manifest, bodies = build_blobs(upsert)
+        changes = {key: digest for key, digest in new_manifest.items() if manifest.get(key) != digest}
+        changes.update({key: None for key in delete_keys if key in manifest})
+        if not changes:
+            return current_version, [], []
+
+        version, _ = await commit_changes(self.db, project, changes, bodies, message)
+        await index_project_changes(self.db, project, changes, upsert)
+        return (
+            version,
+            sorted(decode_path(key) for key in upsert_keys if key in changes),
+            sorted(decode_path(key) for key in delete_keys if key in changes)
+        )
+
+class MongoChatHistoryRepository:
+    def __init__(self, db):
+        self.db = db
+
+    async def list(
+        self,
+        filters: Dict[str, Any],
+        sort_field: str,
+        limit: int,
+        cursor: Optional[str],
+        projection: Dict[str, int]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        histories, next_cursor = await fetch_page(
+            self.db.chat_histories, filters, sort_field, limit, cursor, projection
+        )
+        if "messages" in projection:
+            await attach_messages(self.db, histories)
+        return histories, next_cursor
+
+    async def create(self, history: Dict[str, Any], messages: List[Dict[str, Any]]):
+        await write_messages(self.db, history["id"], 0, messages)
+        await self.db.chat_histories.insert_one(dict(history))
+        await index_chat_messages(self.db, history, 0, messages)
+
+    async def get(self, history_id: str) -> Optional[Dict[str, Any]]:
+        history = await self.db.chat_histories.find_one({"id": history_id})
+        if history:
+            await attach_messages(self.db, [history])
+        return history
+
+    async def replace_messages(
+        self,
+        history_id: str,
+        messages: List[Dict[str, Any]],
+        updated_at: str
+    ) -> Optional[Dict[str, Any]]:
+        await migrate_history(self.db, history_id)
+        history = await self.db.chat_histories.find_one_and_update(
+            {"id": history_id},
+            {"$set": {"messageCount": len(messages), "updated_at": updated_at}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not history:
+            return None
+
+        await replace_messages(self.db, history_id, messages)
+        await remove_chat(self.db, history_id)
+        await index_chat_messages(self.db, history, 0, messages)
+        return {**history, "messages": messages}
+
+    async def append(
+        self,
+        history_id: str,
+        messages: List[Dict[str, Any]],
+        updated_at: str
+    ) -> Optional[Dict[str, Any]]:
+        history = await append_messages(self.db, history_id, messages, updated_at)
+        if history:
+            start = history["messageCount"] - len(messages)
+            await index_chat_messages(self.db, history, start, messages)
+        return history
+
+    async def read_page(
+        self,
+        history_id: str,
+        before: Optional[int],
+        limit: int
+    ) -> Optional[Tuple[List[Dict[str, Any]], int, int]]:
+        return await read_page(self.db, history_id, before, limit)
+
+    async def delete(self, history_id: str) -> bool:
+        result = await self.db.chat_histories.delete_one({"id": history_id})
+        if result.deleted_count == 0:
+            return False
+
+        await delete_messages(self.db, history_id)
+        await remove_chat(self.db, history_id)
+        return True
+
+def get_project_repository():
+    db = get_database()
+    if db is not None:
+        return MongoProjectRepository(db)
+    return get_local_store().projects
+
+def get_chat_history_repository():
+    db = get_database()
+    if db is not None:
+        return MongoChatHistoryRepository(db)
+    return get_local_store().chat_histories
@@ -1,12 +1,27 @@
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 
+class ChatTurn(BaseModel):
+    role: str = Field(..., description="Message role: user, assistant or system")
+    content: str = Field(..., description="Message text")
+
 class GenerateRequest(BaseModel):
     prompt: str = Field(..., description="The prompt to send to the LLM")
     provider: str = Field(default="auto", description="LLM provider: auto, groq, gemini, openai")
     model: Optional[str] = Field(None, description="Specific model to use")
     max_tokens: int = Field(default=2000, description="Maximum tokens to generate")
     temperature: float = Field(default=0.7, description="Temperature for generation")
+    cache: bool = Field(default=False, description="Allow caching the response even when temperature is above 0")
+    hedge: Optional[bool] = Field(None, description="In auto mode, race a second provider if the first is slower than its p95")
+    system: Optional[str] = Field(None, description="System instructions sent ahead of the history")
+    history: List[ChatTurn] = Field(default_factory=list, description="Earlier conversation turns, compacted to fit the token budget")
+    userId: Optional[str] = Field(None, description="User the generation is metered against")
+
+class UsageSchema(BaseModel):
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    latency_ms: float
 
 class GenerateResponse(BaseModel):
     success: bool
@@ -14,12 +29,35 @@ class GenerateResponse(BaseModel):
     error: Optional[str] = None
     provider: str
     model: Optional[str] = None
+    cached: bool = False
+    usage: Optional[UsageSchema] = None
 
 class WebsiteGenerateRequest(BaseModel):
     description: str = Field(..., description="Description of the website to generate")
     style: Optional[str] = Field("modern", description="Style of the website")
     pages: Optional[int] = Field(1, description="Number of pages to generate")
 
+class BatchGenerateRequest(BaseModel):
+    requests: List[GenerateRequest] = Field(default_factory=list, description="Generations to run")
+    website: Optional[WebsiteGenerateRequest] = Field(None, description="Generate one request per website page")
+    parallelism: Optional[int] = Field(None, ge=1, description="Maximum concurrent generations per provider")
+    userId: Optional[str] = Field(None, description="User the website pages are metered against")
+
+class BatchGenerateResponse(BaseModel):
+    results: List[GenerateResponse]
+    succeeded: int
+    failed: int
+
+class UsageTotalsSchema(BaseModel):
+    key: Dict[str, Any]
+    requests: int = 0
+    errors: int = 0
+    cached_requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    avg_latency_ms: float = 0.0
+
 class CreateProjectRequest(BaseModel):
     name: str = Field(..., description="Project name")
     description: str = Field(..., description="Project description")
@@ -35,6 +73,43 @@ class ProjectSchema(BaseModel):
     userId: Optional[str] = None
     githubSynced: Optional[bool] = False
     githubRepoUrl: Optional[str] = None
+    version: Optional[int] = None
+
+class CreateProjectVersionRequest(BaseModel):
+    files: Dict[str, Any] = Field(..., description="Complete file set; only changed files are stored")
+    message: Optional[str] = Field(None, description="Description of the change")
+
+class PatchProjectFilesRequest(BaseModel):
+    expectedVersion: int = Field(..., description="Project version the patch was made against")
+    upsert: Dict[str, Any] = Field(default_factory=dict, description="Files to create or replace, by path")
+    delete: List[str] = Field(default_factory=list, description="Paths to remove")
+    message: Optional[str] = Field(None, description="Description of the change")
+
+class PatchProjectFilesResponse(BaseModel):
+    projectId: str
+    version: int
+    upserted: List[str] = Field(default_factory=list)
+    deleted: List[str] = Field(default_factory=list)
+
+class ProjectVersionSummarySchema(BaseModel):
+    version: int
+    created_at: str
+    message: Optional[str] = None
+    changedCount: int = 0
+
+class ProjectVersionSchema(BaseModel):
+    projectId: str
+    version: int
+    files: Dict[str, Any] = Field(default_factory=dict)
+
+class ProjectDiffSchema(BaseModel):
+    projectId: str
+    fromVersion: int
+    toVersion: int
+    added: List[str] = Field(default_factory=list)
+    removed: List[str] = Field(default_factory=list)
+    modified: List[str] = Field(default_factory=list)
+    files: Optional[Dict[str, Any]] = Field(None, description="New content of added and modified files")
 
 class ChatMessageSchema(BaseModel):
     id: str
@@ -51,13 +126,43 @@ class ChatHistorySchema(BaseModel):
     id: str
     userId: str
     projectId: Optional[str] = None
-    messages: List[Dict[str, Any]]
+    messages: List[Dict[str, Any]] = Field(default_factory=list)
+    messageCount: Optional[int] = None
     created_at: str
     updated_at: str
 
 class UpdateChatHistoryRequest(BaseModel):
     messages: List[Dict[str, Any]]
 
+class AppendChatMessagesRequest(BaseModel):
+    messages: List[Dict[str, Any]] = Field(..., min_length=1, description="Messages to append, oldest first")
+
+class AppendChatMessagesResponse(BaseModel):
+    historyId: str
+    messageCount: int
+    updated_at: str
+
+class ChatMessagesPageSchema(BaseModel):
+    historyId: str
+    messages: List[Dict[str, Any]] = Field(default_factory=list)
+    messageCount: int
+    nextBefore: Optional[int] = Field(None, description="Pass as before= to load the preceding page")
+
+class SearchHitSchema(BaseModel):
+    kind: str = Field(..., description="chat, file or project")
+    score: float
+    snippet: str
+    highlights: List[List[int]] = Field(default_factory=list, description="[start, end) offsets of matches in snippet")
+    projectId: Optional[str] = None
+    historyId: Optional[str] = None
+    seq: Optional[int] = Field(None, description="Message number within the chat history")
+    role: Optional[str] = None
+    path: Optional[str] = None
+
+class SearchResponse(BaseModel):
+    hits: List[SearchHitSchema] = Field(default_factory=list)
+    nextOffset: Optional[int] = None
+
 class PaymentMethodSchema(BaseModel):
     id: str
     name: str
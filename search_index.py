@@ -0,0 +1,163 @@
+import os
+import re
+import json
+from typing import Optional, Dict, Any, List, Tuple
+from pymongo import ReplaceOne, DeleteOne
+from blob_store import decode_path, file_content_text
+
+SEARCH_MAX_TEXT_CHARS = int(os.getenv("SEARCH_MAX_TEXT_CHARS", "20000"))
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "160"))
+
+# Searchable text is kept in `search_documents`, one document per chat
+# message, project file and project description, maintained by the write
+# paths. A compound text index on (userId, text) means a search only walks
+# the index entries of one user. Documents have deterministic ids so that
+# re-indexing an item replaces it.
+
+def message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content", "")
+    return content if isinstance(content, str) else json.dumps(content)
+
+def search_document(doc_id: str, user_id: str, kind: str, text: str, **fields) -> Dict[str, Any]:
+    return {"_id": doc_id, "userId": user_id, "kind": kind, "text": text[:SEARCH_MAX_TEXT_CHARS], **fields}
+
+async def replace_documents(db, documents: List[Dict[str, Any]]):
+    if documents:
+        await db.search_documents.bulk_write(
+            [ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents],
+            ordered=False
+        )
+
+async def index_chat_messages(db, head: Dict[str, Any], start: int, messages: List[Dict[str, Any]]):
+    """Index messages numbered from `start` in the history `head`"""
+    if not head.get("userId"):
+        return
+    await replace_documents(db, [
+        search_document(
+            f"chat:{head['id']}:{start + offset}",
+            head["userId"],
+            "chat",
+            message_text(message),
+            historyId=head["id"],
+            projectId=head.get("projectId"),
+            seq=start + offset,
+            role=message.get("role")
+        )
+        for offset, message in enumerate(messages)
+        if message_text(message)
+    ])
+
+async def remove_chat(db, history_id: str):
+    await db.search_documents.delete_many({"kind": "chat", "historyId": history_id})
+
+def project_file_document(project: Dict[str, Any], path: str, content: Any) -> Dict[str, Any]:
+    return search_document(
+        f"file:{project['id']}:{path}",
+        project["userId"],
+        "file",
+        file_content_text(content),
+        projectId=project["id"],
+        path=path
+    )
+
+async def index_project(db, project: Dict[str, Any], files: Dict[str, Any]):
+    """Index a project's name, description and files"""
+    if not project.get("userId"):
+        return
+    await replace_documents(db, [
+        search_document(
+            f"project:{project['id']}",
+            project["userId"],
+            "project",
+            f"{project.get('name', '')}\n{project.get('description', '')}",
+            projectId=project["id"]
+        ),
+        *(project_file_document(project, path, content) for path, content in files.items())
+    ])
+
+async def index_project_changes(
+    db,
+    project: Dict[str, Any],
+    changes: Dict[str, Optional[str]],
+    files: Dict[str, Any]
+):
+    """Apply a manifest change set (encoded path -> hash or None) to the
+    index, taking the new content of changed paths from `files`"""
+    if not project.get("userId"):
+        return
+
+    operations = []
+    for key, digest in changes.items():
+        path = decode_path(key)
+        if digest is None:
+            operations.append(DeleteOne({"_id": f"file:{project['id']}:{path}"}))
+        elif path in files:
+            document = project_file_document(project, path, files[path])
+            operations.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+    if operations:
+        await db.search_documents.bulk_write(operations, ordered=False)
+
+async def remove_project(db, project_id: str):
+    await db.search_documents.delete_many({"projectId": project_id, "kind": {"$in": ["project", "file"]}})
+
+def query_terms(q: str) -> List[str]:
+    """Positive terms of a $text search string, for highlighting"""
+    terms = []
+    for token in re.findall(r'-?"[^"]*"|\S+', q):
+        if token.startswith("-"):
+            continue
+        terms.extend(re.findall(r"\w+", token.strip('"')))
+    return [term.lower() for term in terms]
+
+def highlight(text: str, terms: List[str]) -> Tuple[str, List[List[int]]]:
+    """A snippet around the first matching word and the [start, end) offsets
+    of matching words in it. Words match on a shared stem-length prefix,
+    roughly mirroring the text index's stemming."""
+    prefixes = [term[:max(3, len(term) - 2)] for term in terms]
+    matches = [
+        match.span() for match in re.finditer(r"\w+", text)
+        if any(match.group().lower().startswith(prefix) for prefix in prefixes)
+    ]
+
+    first = matches[0][0] if matches else 0
+    start = max(0, first - SEARCH_SNIPPET_CHARS // 3)
+    end = min(len(text), start + SEARCH_SNIPPET_CHARS)
+    snippet = text[start:end]
+    spans = [[s - start, e - start] for s, e in matches if s >= start and e <= end]
+    if start > 0:
+        snippet = "…" + snippet
+        spans = [[s + 1, e + 1] for s, e in spans]
+    if end < len(text):
+        snippet += "…"
+    return snippet, spans
+
+async def search(
+    db,
+    user_id: str,
+    q: str,
+    kind: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0
+) -> List[Dict[str, Any]]:
+    """Ranked hits for `q` among one user's documents"""
+    query: Dict[str, Any] = {"userId": user_id, "$text": {"$search": q}}
+    if kind:
+        query["kind"] = kind
+
+    cursor = (
+        db.search_documents.find(query, {"score": {"$meta": "textScore"}})
+        .sort([("score", {"$meta": "textScore"})])
+        .skip(offset)
+        .limit(limit)
+    )
+
+    terms = query_terms(q)
+    hits = []
+    async for document in cursor:
+        snippet, highlights = highlight(document.pop("text"), terms)
+        hits.append({
+            **{key: value for key, value in document.items() if key not in ("_id", "userId")},
+            "snippet": snippet,
+            "highlights": highlights
+        })
+    return hits
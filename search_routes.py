@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from schemas import SearchResponse, SearchHitSchema
+from database import get_database
+from search_index import search
+
+router = APIRouter(prefix="/api/search", tags=["Search"])
+
+SEARCH_KINDS = ["chat", "file", "project"]
+
+@router.get("/", response_model=SearchResponse)
+async def search_user_content(
+    userId: str,
+    q: str = Query(..., min_length=1, max_length=500),
+    kind: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000)
+):
+    """Search a user's chat messages and project files, best matches first.
+    Phrases go in double quotes and -term excludes a word."""
+    if kind and kind not in SEARCH_KINDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"kind must be one of: {', '.join(SEARCH_KINDS)}"
+        )
+    
+    db = get_database()
+    if db is None:
+        return SearchResponse()
+    
+    # One extra hit tells whether there is a next page.
+    hits = await search(db, userId, q, kind, limit + 1, offset)
+    return SearchResponse(
+        hits=[SearchHitSchema(**hit) for hit in hits[:limit]],
+        nextOffset=offset + limit if len(hits) > limit else None
+    )
@@ -0,0 +1,136 @@
+import time
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from github_cache import GitHubResponseCache
+
+TOKEN = {"Authorization": "Bearer token"}
+
+class FakeGitHub:
+    """Serves /user with an ETag and honours If-None-Match; rate-limit
+    headers report `remaining` calls until `reset`"""
+
+    def __init__(self, remaining: int = 5000, reset: float = 0):
+        self.remaining = remaining
+        self.reset = reset or time.time() + 3600
+        self.body = b'{"login": "octo"}'
+        self.etag = '"v1"'
+        self.seen = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.seen.append(request.headers.get("if-none-match"))
+        headers = {"x-ratelimit-remaining": str(self.remaining), "x-ratelimit-reset": str(self.reset)}
+        if request.headers.get("if-none-match") == self.etag:
+            return httpx.Response(304, headers=headers)
+        self.remaining -= 1
+        headers["x-ratelimit-remaining"] = str(self.remaining)
+        return httpx.Response(200, headers={**headers, "etag": self.etag}, content=self.body)
+
+def run_with(cache: GitHubResponseCache, github: FakeGitHub, calls):
+    async def run():
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(github.handler),
+            base_url="https://api.github.test",
+            event_hooks={"request": [cache.throttle], "response": [cache.record_rate_limit]}
+        )
+        async with client:
+            return [await call(client) for call in calls]
+    return asyncio.run(run())
+
+def test_unchanged_resource_is_revalidated_and_answered_from_cache():
+    cache = GitHubResponseCache()
+    github = FakeGitHub()
+
+    def get(client):
+        return cache.get(client, "/user", TOKEN)
+
+    async def change_then_get(client):
+        github.body, github.etag = b'{"login": "renamed"}', '"v2"'
+        return await get(client)
+
+    first, second, third = run_with(cache, github, [get, get, change_then_get])
+
+    assert github.seen == [None, '"v1"', '"v1"']
+    assert [response.status_code for response in (first, second, third)] == [200, 200, 200]
+    assert second.json() == {"login": "octo"}
+    assert third.json() == {"login": "renamed"}
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 2
+
+def test_entries_are_per_token():
+    cache = GitHubResponseCache()
+    github = FakeGitHub()
+
+    run_with(cache, github, [
+        lambda client: cache.get(client, "/user", TOKEN),
+        lambda client: cache.get(client, "/user", {"Authorization": "Bearer other"})
+    ])
+
+    assert github.seen == [None, None]
+
+def test_calls_near_the_limit_are_refused_when_the_reset_is_far():
+    cache = GitHubResponseCache(reserve=10, max_wait=5)
+    github = FakeGitHub(remaining=11)
+
+    def get(path):
+        return lambda client: cache.get(client, path, TOKEN)
+
+    run_with(cache, github, [get("/user")])
+    with pytest.raises(HTTPException) as error:
+        run_with(cache, github, [get("/repos/octo/site")])
+
+    assert error.value.status_code == 429
+    assert cache.stats["refused"] == 1
+    assert len(github.seen) == 1
+
+def test_conditional_gets_still_go_through_near_the_limit():
+    cache = GitHubResponseCache(reserve=10, max_wait=5)
+    github = FakeGitHub(remaining=11)
+
+    def get(client):
+        return cache.get(client, "/user", TOKEN)
+
+    # The revalidation carries If-None-Match and a 304 is free.
+    first, second = run_with(cache, github, [get, get])
+
+    assert second.status_code == 200 and second.json() == first.json()
+    assert cache.stats["refused"] == 0 and cache.stats["hits"] == 1
+
+def test_calls_near_the_limit_wait_for_a_close_reset():
+    cache = GitHubResponseCache(reserve=10, max_wait=5)
+    github = FakeGitHub(remaining=11, reset=time.time() + 0.3)
+
+    def get(path):
+        return lambda client: cache.get(client, path, TOKEN)
+
+    started = time.perf_counter()
+    run_with(cache, github, [get("/user"), get("/repos/octo/site")])
+
+    assert cache.stats["throttled"] == 1
+    assert time.perf_counter() - started >= 0.2
+
+def test_entry_evicted_during_revalidation_is_still_served():
+    cache = GitHubResponseCache(max_entries=1)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("if-none-match"):
+            await asyncio.sleep(0.05)
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"etag": '"v1"'}, content=request.url.path.encode())
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport, base_url="https://api.github.test") as client:
+            await cache.get(client, "/a", TOKEN)
+
+            async def evict():
+                await asyncio.sleep(0.01)
+                await cache.get(client, "/b", TOKEN)
+
+            revalidated, _ = await asyncio.gather(cache.get(client, "/a", TOKEN), evict())
+            return revalidated
+
+    revalidated = asyncio.run(run())
+
+    assert revalidated.status_code == 200 and revalidated.content == b"/a"
+    assert len(cache.entries) == 1
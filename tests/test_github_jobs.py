@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+import github_jobs
+from github_jobs import GitHubSyncJobs, INTERRUPTED_MESSAGE
+
+def matches(doc, query) -> bool:
+    """The subset of MongoDB query syntax GitHubSyncJobs uses"""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, operand in condition.items():
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$lt" and (value is None or not value < operand):
+                return False
+            if op == "$exists" and (field in doc) != operand:
+                return False
+    return True
+
+class FakeJobs:
+    """github_sync_jobs with the partial unique index on active projectId"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        if doc.get("active") and any(d.get("active") and d["projectId"] == doc["projectId"] for d in self.docs):
+            raise DuplicateKeyError("E11000 duplicate key projectId_active_unique")
+        self.docs.append(dict(doc))
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                return dict(doc)
+        return None
+
+    def apply(self, doc, update):
+        doc.update(update.get("$set", {}))
+        for field in update.get("$unset", {}):
+            doc.pop(field, None)
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if matches(doc, query):
+                self.apply(doc, update)
+                return
+
+    async def update_many(self, query, update):
+        for doc in [doc for doc in self.docs if matches(doc, query)]:
+            self.apply(doc, update)
+
+class FakeProjects:
+    def __init__(self, projects):
+        self.projects = projects
+
+    async def find_one(self, query, projection=None):
+        return self.projects.get(query["id"])
+
+class FakeDB:
+    def __init__(self, projects):
+        self.github_sync_jobs = FakeJobs()
+        self.projects = FakeProjects(projects)
+
+def test_enqueue_returns_the_job_in_flight_until_it_finishes(monkeypatch):
+    gate = asyncio.Event()
+    pushes = []
+
+    async def fake_update_repo(db, project, access_token, force, progress):
+        pushes.append(project["id"])
+        await gate.wait()
+        return {"commitSha": "c1"}
+
+    monkeypatch.setattr(github_jobs, "update_repo", fake_update_repo)
+    project = {"id": "p1", "userId": "u1"}
+    db = FakeDB({"p1": project})
+    jobs = GitHubSyncJobs(progress_interval=0.01)
+
+    async def run():
+        first, first_dedup = await jobs.enqueue(db, project, "token", "update", {"force": False})
+        second, second_dedup = await jobs.enqueue(db, project, "token", "update", {"force": False})
+        gate.set()
+        await asyncio.gather(*jobs.tasks.values())
+        third, third_dedup = await jobs.enqueue(db, project, "token", "update", {"force": False})
+        await asyncio.gather(*jobs.tasks.values())
+        return (first, first_dedup), (second, second_dedup), (third, third_dedup)
+
+    (first, first_dedup), (second, second_dedup), (third, third_dedup) = asyncio.run(run())
+
+    assert not first_dedup and second_dedup
+    assert second["id"] == first["id"]
+    assert not third_dedup and third["id"] != first["id"]
+    assert pushes == ["p1", "p1"]
+    finished = {doc["id"]: doc for doc in db.github_sync_jobs.docs}
+    assert finished[first["id"]]["status"] == "succeeded"
+    assert "active" not in finished[first["id"]]
+    assert "workerId" not in first and "heartbeat_at" not in first
+
+def test_heartbeat_fails_only_jobs_of_dead_workers():
+    jobs = GitHubSyncJobs(stale_after=60)
+    db = FakeDB({})
+    now = datetime.utcnow()
+    fresh = now.isoformat()
+    stale = (now - timedelta(seconds=120)).isoformat()
+    db.github_sync_jobs.docs = [
+        {"id": "peer", "projectId": "a", "active": True, "status": "running", "workerId": "w2", "heartbeat_at": fresh},
+        {"id": "dead", "projectId": "b", "active": True, "status": "running", "workerId": "w3", "heartbeat_at": stale},
+        {"id": "legacy", "projectId": "c", "active": True, "status": "queued"},
+        {"id": "mine", "projectId": "d", "active": True, "status": "queued", "workerId": jobs.worker_id,
+         "heartbeat_at": stale}
+    ]
+    jobs.tasks["mine"] = None
+
+    asyncio.run(jobs.heartbeat_once(db))
+
+    docs = {doc["id"]: doc for doc in db.github_sync_jobs.docs}
+    assert docs["peer"]["active"] and docs["peer"]["status"] == "running"
+    assert docs["mine"]["active"] and docs["mine"]["heartbeat_at"] > stale
+    for job_id in ("dead", "legacy"):
+        assert "active" not in docs[job_id]
+        assert docs[job_id]["status"] == "failed"
+        assert docs[job_id]["error"] == INTERRUPTED_MESSAGE
@@ -0,0 +1,105 @@
+import json
+import base64
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from github_client import push_files, git_blob_sha
+
+REPO = "/repos/octo/site"
+
+class FakeGitHub:
+    """Just enough of the Git Data API for one repository with a `main`
+    branch; records every request it serves"""
+
+    def __init__(self):
+        self.head = "c0"
+        self.commits = {"c0": {"sha": "c0", "tree": {"sha": "t0"}, "parents": []}}
+        self.blobs = {}
+        self.trees = {}
+        self.ref_updates = []
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        body = json.loads(request.content) if request.content else None
+        self.requests.append((request.method, path))
+
+        if request.method == "GET" and path == f"{REPO}/git/ref/heads/main":
+            return httpx.Response(200, json={"object": {"sha": self.head, "type": "commit"}})
+        if request.method == "GET" and path.startswith(f"{REPO}/git/commits/"):
+            return httpx.Response(200, json=self.commits[path.rsplit("/", 1)[1]])
+        if request.method == "POST" and path == f"{REPO}/git/blobs":
+            data = base64.b64decode(body["content"])
+            sha = git_blob_sha(data)
+            self.blobs[sha] = data
+            return httpx.Response(201, json={"sha": sha})
+        if request.method == "POST" and path == f"{REPO}/git/trees":
+            sha = f"t{len(self.trees) + 1}"
+            self.trees[sha] = body
+            return httpx.Response(201, json={"sha": sha})
+        if request.method == "POST" and path == f"{REPO}/git/commits":
+            sha = f"c{len(self.commits)}"
+            self.commits[sha] = {
+                "sha": sha,
+                "tree": {"sha": body["tree"]},
+                "parents": body["parents"],
+                "message": body["message"]
+            }
+            return httpx.Response(201, json={"sha": sha})
+        if request.method == "PATCH" and path == f"{REPO}/git/refs/heads/main":
+            self.ref_updates.append(body)
+            self.head = body["sha"]
+            return httpx.Response(200, json={"object": {"sha": body["sha"]}})
+        return httpx.Response(404, json={"message": "Not Found"})
+
+def push(github: FakeGitHub, **kwargs) -> str:
+    async def run():
+        transport = httpx.MockTransport(github.handler)
+        async with httpx.AsyncClient(transport=transport, base_url="https://api.github.test") as client:
+            return await push_files(client, "token", "octo", "site", "main", **kwargs)
+    return asyncio.run(run())
+
+def test_push_is_one_commit_on_the_branch_head():
+    github = FakeGitHub()
+    contents = {"index.html": b"<h1>hi</h1>", "src/app.js": b"console.log(1)"}
+    uploaded = []
+
+    commit_sha = push(
+        github,
+        contents=contents,
+        message="Update project files",
+        deleted=["old.css"],
+        on_uploaded=uploaded.append
+    )
+
+    # Every file is one blob; then exactly one tree, one commit, one ref update.
+    assert set(github.blobs) == {git_blob_sha(data) for data in contents.values()}
+    assert sorted(uploaded) == sorted(contents)
+    assert len(github.trees) == 1
+    assert len(github.commits) == 2
+    assert [method for method, _ in github.requests].count("PATCH") == 1
+    assert github.head == commit_sha
+
+    commit = github.commits[commit_sha]
+    assert commit["parents"] == ["c0"]
+    assert commit["message"] == "Update project files"
+
+    tree = github.trees[commit["tree"]["sha"]]
+    assert tree["base_tree"] == "t0"
+    entries = {entry["path"]: entry["sha"] for entry in tree["tree"]}
+    assert entries == {
+        "index.html": git_blob_sha(contents["index.html"]),
+        "src/app.js": git_blob_sha(contents["src/app.js"]),
+        "old.css": None
+    }
+    assert github.ref_updates == [{"sha": commit_sha, "force": False}]
+
+def test_push_refuses_when_the_branch_moved():
+    github = FakeGitHub()
+
+    with pytest.raises(HTTPException) as error:
+        push(github, contents={"index.html": b"x"}, message="Update", expected_head="c-old")
+
+    assert error.value.status_code == 409
+    assert not github.blobs and not github.trees and not github.ref_updates
@@ -0,0 +1,25 @@
+import asyncio
+from github_sync import SyncProgress, plan_sync, update_repo
+
+def test_plan_sync_sends_only_changed_and_removed_files():
+    project = {
+        "manifest": {"a": "h1", "b": "h2-new", "c": "h3"},
+        "githubManifest": {"a": {"hash": "h1"}, "b": {"hash": "h2"}, "d": {"hash": "h4"}}
+    }
+
+    assert plan_sync(project) == (["b", "c"], ["d"])
+    assert plan_sync(project, full=True) == (["a", "b", "c"], ["d"])
+
+def test_empty_project_synced_before_manifests_is_up_to_date():
+    # Synced by an old version: no githubCommitSha and nothing to push.
+    project = {
+        "id": "p1",
+        "githubSynced": True,
+        "githubRepoUrl": "https://github.com/octo/site",
+        "files": {}
+    }
+
+    result = asyncio.run(update_repo(None, project, "token", False, SyncProgress()))
+
+    assert result["changed"] == 0 and result["deleted"] == 0
+    assert result["commitSha"] is None
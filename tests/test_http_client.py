@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+import http_client
+from http_client import RetryTransport, HTTP_RETRY_BACKOFF, HTTP_RETRY_MAX_WAIT
+
+class ScriptedServer:
+    """Stands in for the network under RetryTransport: each request gets
+    the next scripted response, or raises it if it is an exception"""
+
+    def __init__(self, script, delays):
+        self.script = list(script)
+        self.methods = []
+        self.delays = delays
+
+    async def handle_async_request(self, transport, request):
+        self.methods.append(request.method)
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+@pytest.fixture
+def server(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(http_client, "asyncio", SimpleNamespace(sleep=sleep))
+
+    def install(*script):
+        scripted = ScriptedServer(script, delays)
+        monkeypatch.setattr(
+            httpx.AsyncHTTPTransport,
+            "handle_async_request",
+            lambda transport, request: scripted.handle_async_request(transport, request)
+        )
+        return scripted
+
+    return install
+
+def send(method: str, max_retries: int = 3):
+    stats = {"requests": 0, "connections": 0, "retries": 0, "errors": 0}
+
+    async def run():
+        transport = RetryTransport(stats, max_retries=max_retries)
+        async with httpx.AsyncClient(transport=transport, base_url="https://api.github.test") as client:
+            return await client.request(method, "/repos/octo/site")
+
+    return asyncio.run(run()), stats
+
+def test_server_errors_on_get_are_retried_with_jittered_backoff(server):
+    scripted = server(httpx.Response(503), httpx.Response(502), httpx.Response(200, json={"ok": True}))
+
+    response, stats = send("GET")
+
+    assert response.status_code == 200
+    assert scripted.methods == ["GET"] * 3
+    assert stats["requests"] == 3 and stats["retries"] == 2
+    # Full jitter: each wait is somewhere below the exponential cap.
+    for attempt, delay in enumerate(scripted.delays):
+        assert 0 <= delay <= min(HTTP_RETRY_MAX_WAIT, HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+def test_server_errors_on_post_are_not_retried(server):
+    scripted = server(httpx.Response(503))
+
+    response, stats = send("POST")
+
+    assert response.status_code == 503
+    assert scripted.methods == ["POST"]
+    assert stats["retries"] == 0
+
+def test_rate_limited_post_waits_for_retry_after(server):
+    scripted = server(httpx.Response(429, headers={"retry-after": "2"}), httpx.Response(201))
+
+    response, _ = send("POST")
+
+    assert response.status_code == 201
+    assert scripted.delays == [2.0]
+
+def test_exhausted_rate_limit_and_long_retry_after_are_returned_at_once(server):
+    scripted = server(
+        httpx.Response(403, headers={"x-ratelimit-remaining": "0", "retry-after": "1"}),
+        httpx.Response(429, headers={"retry-after": str(HTTP_RETRY_MAX_WAIT + 60)})
+    )
+
+    first, _ = send("GET")
+    second, _ = send("GET")
+
+    assert (first.status_code, second.status_code) == (403, 429)
+    assert scripted.methods == ["GET", "GET"]
+    assert scripted.delays == []
+
+def test_retries_stop_after_max_retries(server):
+    scripted = server(*[httpx.Response(500) for _ in range(3)])
+
+    response, stats = send("GET", max_retries=2)
+
+    assert response.status_code == 500
+    assert len(scripted.methods) == 3
+    assert stats["retries"] == 2
+
+def test_connect_errors_are_retried_for_any_method_then_raised(server):
+    error = httpx.ConnectError("connection refused")
+    scripted = server(error, httpx.Response(201))
+
+    response, stats = send("POST")
+
+    assert response.status_code == 201
+    assert stats["errors"] == 1 and stats["retries"] == 1
+
+    scripted = server(error, error, error)
+    with pytest.raises(httpx.ConnectError):
+        send("POST", max_retries=2)
+    assert len(scripted.methods) == 3
@@ -0,0 +1,108 @@
+import time
+import asyncio
+import threading
+import httpx
+from fastapi import FastAPI
+import llm_routes
+import llm_service as llm_service_module
+from llm_service import LLMService, ClientRegistry
+
+DELAY = 0.3
+REQUESTS = 8
+POOL_SIZE = 4
+
+def chat_completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "mixtral-8x7b-32768",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4}
+    }
+
+def post_concurrently(service: LLMService, provider: str, monkeypatch):
+    """Send REQUESTS concurrent /api/llm/generate calls; returns (responses, seconds)"""
+    monkeypatch.setattr(llm_routes, "llm_service", service)
+    app = FastAPI()
+    app.include_router(llm_routes.router)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/api/llm/generate", json={"prompt": f"page {i}", "provider": provider})
+                for i in range(REQUESTS)
+            ))
+            return responses, time.perf_counter() - started
+
+    try:
+        return asyncio.run(run())
+    finally:
+        service.executor.shutdown(wait=False)
+
+def test_parallel_groq_calls_overlap(monkeypatch):
+    """The real AsyncGroq client, over a transport that takes DELAY per
+    request: N concurrent calls finish in about one DELAY, not N"""
+    requests = []
+
+    async def slow_provider(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        await asyncio.sleep(DELAY)
+        return httpx.Response(200, json=chat_completion("ok"))
+
+    # Every provider client is built on the registry's pooled transport.
+    monkeypatch.setattr(
+        ClientRegistry,
+        "http_client",
+        lambda self, provider: httpx.AsyncClient(transport=httpx.MockTransport(slow_provider))
+    )
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    service = LLMService()
+
+    responses, elapsed = post_concurrently(service, "groq", monkeypatch)
+
+    assert all(response.status_code == 200 for response in responses)
+    assert [response.json()["response"] for response in responses] == ["ok"] * REQUESTS
+    assert requests == ["/openai/v1/chat/completions"] * REQUESTS
+    assert elapsed < DELAY * 2, f"{REQUESTS} calls took {elapsed:.2f}s; they ran one after another"
+
+class BlockingGeminiModel:
+    """A Gemini model handle with only the blocking call, like SDK versions
+    without generate_content_async"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.threads = set()
+
+    def generate_content(self, contents, generation_config=None):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            self.threads.add(threading.current_thread().name)
+        time.sleep(DELAY)
+        with self.lock:
+            self.running -= 1
+        return type("Response", (), {"text": "ok", "usage_metadata": None})()
+
+def test_blocking_gemini_calls_run_in_the_bounded_pool(monkeypatch):
+    """Blocking SDK calls are bridged through the thread pool: they run off
+    the event loop, overlapping up to the pool size and no further"""
+    model = BlockingGeminiModel()
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(llm_service_module, "LLM_THREAD_POOL_SIZE", POOL_SIZE)
+    monkeypatch.setattr(llm_service_module.genai, "configure", lambda **kwargs: None)
+    monkeypatch.setattr(ClientRegistry, "gemini_model", lambda self, *args: (model, None))
+    service = LLMService()
+
+    responses, elapsed = post_concurrently(service, "gemini", monkeypatch)
+
+    assert all(response.status_code == 200 for response in responses)
+    assert model.threads and all(name.startswith("llm-blocking") for name in model.threads)
+    assert model.peak == POOL_SIZE
+    # Two waves of POOL_SIZE calls; run on the event loop it would be REQUESTS.
+    waves = REQUESTS // POOL_SIZE
+    assert DELAY * waves <= elapsed < DELAY * (waves + 1), f"calls took {elapsed:.2f}s"
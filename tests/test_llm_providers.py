@@ -0,0 +1,48 @@
+import asyncio
+from typing import List, Tuple
+from llm_service import LLMService, Completion
+
+def service_with_groq(monkeypatch) -> Tuple[LLMService, List[str]]:
+    service = LLMService()
+    calls = []
+
+    async def fake_groq(messages, model, max_tokens, temperature):
+        calls.append(model)
+        return Completion("ok", 1, 1)
+
+    async def fake_stream(messages, model, max_tokens, temperature):
+        calls.append(model)
+        yield "ok"
+
+    monkeypatch.setattr(service, "groq_client", object())
+    monkeypatch.setattr(service, "generate_with_groq", fake_groq)
+    monkeypatch.setattr(service, "stream_with_groq", fake_stream)
+    return service, calls
+
+def test_unknown_provider_is_rejected_not_served_by_fallback(monkeypatch):
+    service, calls = service_with_groq(monkeypatch)
+
+    result = asyncio.run(service.generate("hi", provider="nope"))
+
+    assert not result["success"]
+    assert result["error"] == "Unknown provider: nope"
+    assert calls == []
+
+def test_unknown_provider_stream_ends_with_error(monkeypatch):
+    service, calls = service_with_groq(monkeypatch)
+
+    async def collect():
+        return [event async for event in service.stream("hi", provider="nope")]
+
+    events = asyncio.run(collect())
+
+    assert [event["type"] for event in events] == ["error"]
+    assert events[0]["error"] == "Unknown provider: nope"
+    assert calls == []
+
+def test_known_provider_still_served(monkeypatch):
+    service, calls = service_with_groq(monkeypatch)
+
+    result = asyncio.run(service.generate("hi", provider="groq"))
+
+    assert result["success"] and result["provider"] == "groq"
@@ -0,0 +1,34 @@
+from llm_router import ProviderRouter
+
+def test_failing_provider_ranks_after_measured_healthy_one():
+    router = ProviderRouter(min_samples=5, max_error_rate=0.5)
+    for _ in range(50):
+        router.record("openai", "gpt", 0.0, False)
+        router.record("groq", "llama", 0.2, True)
+
+    assert not router.is_healthy("openai", "gpt")
+    assert router.rank([("openai", "gpt"), ("groq", "llama")]) == [("groq", "llama"), ("openai", "gpt")]
+
+def test_unmeasured_pairs_explore_first_then_faster_wins():
+    router = ProviderRouter(min_samples=3)
+    for _ in range(3):
+        router.record("gemini", "flash", 0.5, True)
+        router.record("groq", "llama", 0.1, True)
+    router.record("openai", "gpt", 0.3, True)
+
+    ranked = router.rank([("gemini", "flash"), ("groq", "llama"), ("openai", "gpt")])
+
+    assert ranked == [("openai", "gpt"), ("groq", "llama"), ("gemini", "flash")]
+
+def test_failures_alone_count_as_samples():
+    router = ProviderRouter(min_samples=5, max_error_rate=0.5)
+    for _ in range(5):
+        router.record("groq", "llama", 0.1, True)
+    # Two failures out of five: measured and still healthy, but with no
+    # latencies it must not jump ahead as "unmeasured".
+    for _ in range(2):
+        router.record("openai", "gpt", 0.0, False)
+    for _ in range(3):
+        router.record("openai", "gpt", 0.4, True)
+
+    assert router.rank([("openai", "gpt"), ("groq", "llama")]) == [("groq", "llama"), ("openai", "gpt")]
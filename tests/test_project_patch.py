@@ -0,0 +1,90 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+import local_store
+import project_routes
+from local_store import LocalStore
+
+@pytest.fixture
+def client_factory(tmp_path, monkeypatch):
+    """Project routes backed by a fresh SQLite store (no MONGO_URL)"""
+    monkeypatch.setattr(local_store, "local_store", LocalStore(str(tmp_path / "projects.db")))
+    app = FastAPI()
+    app.include_router(project_routes.router)
+
+    def make():
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    yield make
+    asyncio.run(local_store.close_local_store())
+
+async def create_project(client: httpx.AsyncClient) -> str:
+    response = await client.post("/api/projects/", json={
+        "name": "site",
+        "description": "d",
+        "files": {"index.html": "<h1>v1</h1>", "app.js": "1"}
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+def test_patch_with_stale_version_is_rejected(client_factory):
+    async def run():
+        async with client_factory() as client:
+            project_id = await create_project(client)
+            first = await client.patch(f"/api/projects/{project_id}/files", json={
+                "expectedVersion": 1, "upsert": {"index.html": "<h1>v2</h1>"}, "delete": ["app.js"]
+            })
+            stale = await client.patch(f"/api/projects/{project_id}/files", json={
+                "expectedVersion": 1, "upsert": {"index.html": "<h1>lost</h1>"}
+            })
+            project = await client.get(f"/api/projects/{project_id}")
+            return first, stale, project
+
+    first, stale, project = asyncio.run(run())
+
+    assert first.status_code == 200
+    assert first.json()["version"] == 2
+    assert first.json()["upserted"] == ["index.html"] and first.json()["deleted"] == ["app.js"]
+    assert stale.status_code == 409
+    assert "version 2" in stale.json()["detail"]
+    assert project.json()["files"] == {"index.html": "<h1>v2</h1>"}
+
+def test_concurrent_patches_on_one_version_let_exactly_one_through(client_factory):
+    async def run():
+        async with client_factory() as client:
+            project_id = await create_project(client)
+            responses = await asyncio.gather(*(
+                client.patch(f"/api/projects/{project_id}/files", json={
+                    "expectedVersion": 1, "upsert": {"index.html": f"<h1>writer {i}</h1>"}
+                })
+                for i in range(5)
+            ))
+            project = await client.get(f"/api/projects/{project_id}")
+            return responses, project
+
+    responses, project = asyncio.run(run())
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200, 409, 409, 409, 409]
+    [winner] = [response for response in responses if response.status_code == 200]
+    assert winner.json()["version"] == 2
+    assert project.json()["files"]["index.html"].startswith("<h1>writer ")
+
+def test_unchanged_patch_keeps_the_version(client_factory):
+    async def run():
+        async with client_factory() as client:
+            project_id = await create_project(client)
+            same = await client.patch(f"/api/projects/{project_id}/files", json={
+                "expectedVersion": 1, "upsert": {"app.js": "1"}
+            })
+            both = await client.patch(f"/api/projects/{project_id}/files", json={
+                "expectedVersion": 1, "upsert": {"app.js": "2"}, "delete": ["app.js"]
+            })
+            return same, both
+
+    same, both = asyncio.run(run())
+
+    assert same.status_code == 200
+    assert same.json()["version"] == 1 and same.json()["upserted"] == []
+    assert both.status_code == 400
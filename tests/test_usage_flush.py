@@ -0,0 +1,109 @@
+import asyncio
+from pymongo.errors import BulkWriteError
+import usage
+from usage import UsageMeter
+
+class FakeRecords:
+    """usage_records with a unique _id, like MongoDB"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for index, doc in enumerate(docs):
+            doc.setdefault("_id", f"auto-{len(self.docs)}-{index}")
+            if doc["_id"] in self.docs:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+            else:
+                self.docs[doc["_id"]] = dict(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+class FakeDaily:
+    """usage_daily that applies $inc upserts and can be told to fail"""
+
+    def __init__(self):
+        self.totals = {}
+        self.failures = 0
+
+    async def bulk_write(self, updates, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset")
+        for update in updates:
+            key = tuple(update._filter.values())
+            total = self.totals.setdefault(key, {})
+            for field, value in update._doc["$inc"].items():
+                total[field] = total.get(field, 0) + value
+
+class FakeDB:
+    def __init__(self):
+        self.usage_records = FakeRecords()
+        self.usage_daily = FakeDaily()
+
+def record(meter: UsageMeter, tokens: int):
+    meter.record("u1", "groq", "llama", tokens, tokens, 10.0)
+
+def test_failed_rollup_is_retried_once_and_records_are_not_reinserted(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(usage, "get_database", lambda: db)
+    meter = UsageMeter(flush_size=1000)
+
+    async def run():
+        record(meter, 5)
+        record(meter, 10)
+        db.usage_daily.failures = 1
+        await meter.flush()
+        assert meter.stats["flush_errors"] == 1
+        assert not db.usage_daily.totals
+
+        record(meter, 20)
+        await meter.flush()
+        await meter.flush()
+
+    asyncio.run(run())
+
+    assert len(db.usage_records.docs) == 3
+    assert meter.stats["flushed"] == 3
+    assert meter.stats["flush_errors"] == 1
+    assert meter.get_stats()["buffered"] == 0
+    assert meter.get_stats()["pending_rollups"] == 0
+    totals = db.usage_daily.totals
+    assert len(totals) == 1
+    [daily] = totals.values()
+    assert daily["requests"] == 3
+    assert daily["total_tokens"] == 2 * (5 + 10 + 20)
+
+def test_batch_retried_after_partial_insert_skips_written_records(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(usage, "get_database", lambda: db)
+    meter = UsageMeter(flush_size=1000)
+    calls = []
+    insert_many = db.usage_records.insert_many
+
+    async def insert_then_fail(docs, ordered=True):
+        calls.append(len(docs))
+        if len(calls) == 1:
+            # The first record is written before the connection drops.
+            await insert_many(docs[:1], ordered)
+            raise ConnectionError("connection reset")
+        await insert_many(docs, ordered)
+
+    db.usage_records.insert_many = insert_then_fail
+
+    async def run():
+        record(meter, 5)
+        record(meter, 10)
+        await meter.flush()
+        assert meter.get_stats()["buffered"] == 2
+        await meter.flush()
+
+    asyncio.run(run())
+
+    assert calls == [2, 2]
+    assert len(db.usage_records.docs) == 2
+    assert meter.get_stats()["buffered"] == 0
+    [daily] = db.usage_daily.totals.values()
+    assert daily["requests"] == 2
+    assert daily["total_tokens"] == 30
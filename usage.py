@@ -0,0 +1,186 @@
+import os
+import uuid
+import asyncio
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from database import get_database
+
+LLM_USAGE_FLUSH_SIZE = int(os.getenv("LLM_USAGE_FLUSH_SIZE", "500"))
+LLM_USAGE_FLUSH_INTERVAL = float(os.getenv("LLM_USAGE_FLUSH_INTERVAL", "5"))
+LLM_USAGE_MAX_BUFFER = int(os.getenv("LLM_USAGE_MAX_BUFFER", "50000"))
+
+ANONYMOUS_USER = "anonymous"
+DUPLICATE_KEY = 11000
+
+class UsageMeter:
+    """Buffers per-generation usage records in memory and writes them to
+    MongoDB in batches: raw records go to `usage_records` with one
+    insert_many, and per-(user, day, provider, model) totals are folded into
+    `usage_daily` with one bulk_write of $inc upserts. Usage queries read the
+    small daily rollups instead of scanning raw records.
+    
+    Each record gets its `_id` when it is recorded, so re-inserting a batch
+    after a partial failure skips the records already written. Rollup
+    updates that failed are kept apart and retried on their own, so an
+    $inc that was applied is never applied twice."""
+    
+    def __init__(
+        self,
+        flush_size: int = LLM_USAGE_FLUSH_SIZE,
+        flush_interval: float = LLM_USAGE_FLUSH_INTERVAL,
+        max_buffer: int = LLM_USAGE_MAX_BUFFER
+    ):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.buffer: List[Dict[str, Any]] = []
+        self.pending_rollups: List[UpdateOne] = []
+        self.flush_lock = asyncio.Lock()
+        self.flusher: Optional[asyncio.Task] = None
+        self.pending_flush: Optional[asyncio.Task] = None
+        self.stats = {"recorded": 0, "flushed": 0, "dropped": 0, "flush_errors": 0}
+    
+    def record(
+        self,
+        user_id: Optional[str],
+        provider: str,
+        model: Optional[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency_ms: float,
+        success: bool = True,
+        cached: bool = False
+    ):
+        now = datetime.utcnow()
+        self.buffer.append({
+            "_id": str(uuid.uuid4()),
+            "userId": user_id or ANONYMOUS_USER,
+            "provider": provider,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "latency_ms": round(latency_ms, 1),
+            "success": success,
+            "cached": cached,
+            "day": now.strftime("%Y-%m-%d"),
+            "created_at": now
+        })
+        self.stats["recorded"] += 1
+        
+        if len(self.buffer) > self.max_buffer:
+            overflow = len(self.buffer) - self.max_buffer
+            del self.buffer[:overflow]
+            self.stats["dropped"] += overflow
+        
+        if len(self.buffer) >= self.flush_size and not (self.pending_flush and not self.pending_flush.done()):
+            try:
+                self.pending_flush = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass
+    
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.buffer and not self.pending_rollups:
+                return
+            
+            db = get_database()
+            if db is None:
+                self.stats["dropped"] += len(self.buffer)
+                self.buffer = []
+                self.pending_rollups = []
+                return
+            
+            batch, self.buffer = self.buffer, []
+            if batch:
+                try:
+                    await insert_records(db, batch)
+                except Exception as e:
+                    # Put the batch back so the next flush retries it; the
+                    # buffer cap bounds memory if the database stays down.
+                    self.stats["flush_errors"] += 1
+                    self.buffer = batch + self.buffer
+                    print(f"Usage flush failed: {e}")
+                    return
+                self.stats["flushed"] += len(batch)
+                self.pending_rollups.extend(build_rollup_updates(batch))
+            
+            updates, self.pending_rollups = self.pending_rollups, []
+            try:
+                await db.usage_daily.bulk_write(updates, ordered=False)
+            except BulkWriteError as e:
+                # Unordered: everything but the reported errors was applied.
+                self.stats["flush_errors"] += 1
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                self.pending_rollups = [update for i, update in enumerate(updates) if i in failed] + self.pending_rollups
+                print(f"Usage rollup failed: {e}")
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                self.pending_rollups = updates + self.pending_rollups
+                print(f"Usage rollup failed: {e}")
+    
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    async def start(self):
+        if not self.flusher:
+            self.flusher = asyncio.create_task(self._flush_periodically())
+    
+    async def stop(self):
+        if self.flusher:
+            self.flusher.cancel()
+            try:
+                await self.flusher
+            except asyncio.CancelledError:
+                pass
+            self.flusher = None
+        await self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "buffered": len(self.buffer), "pending_rollups": len(self.pending_rollups)}
+
+async def insert_records(db, batch: List[Dict[str, Any]]):
+    """Insert raw records; ones already written by an earlier attempt are
+    skipped"""
+    try:
+        await db.usage_records.insert_many(batch, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if not errors or any(error.get("code") != DUPLICATE_KEY for error in errors):
+            raise
+
+def build_rollup_updates(batch: List[Dict[str, Any]]) -> List[UpdateOne]:
+    totals: Dict[Tuple, Dict[str, Any]] = {}
+    for record in batch:
+        key = (record["userId"], record["day"], record["provider"], record["model"])
+        total = totals.setdefault(key, {
+            "requests": 0,
+            "errors": 0,
+            "cached_requests": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "latency_ms": 0.0
+        })
+        total["requests"] += 1
+        total["errors"] += 0 if record["success"] else 1
+        total["cached_requests"] += 1 if record["cached"] else 0
+        total["prompt_tokens"] += record["prompt_tokens"]
+        total["completion_tokens"] += record["completion_tokens"]
+        total["total_tokens"] += record["total_tokens"]
+        total["latency_ms"] += record["latency_ms"]
+    
+    return [
+        UpdateOne(
+            {"userId": user_id, "day": day, "provider": provider, "model": model},
+            {"$inc": increments},
+            upsert=True
+        )
+        for (user_id, day, provider, model), increments in totals.items()
+    ]
+
+usage_meter = UsageMeter()
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from schemas import UsageTotalsSchema
+from database import get_database
+from usage import usage_meter
+
+router = APIRouter(prefix="/api/usage", tags=["Usage"])
+
+GROUP_FIELDS = {
+    "day": ["day"],
+    "user": ["userId"],
+    "provider": ["provider", "model"],
+    "user_day": ["userId", "day"]
+}
+
+@router.get("/", response_model=List[UsageTotalsSchema])
+async def get_usage(
+    userId: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    groupBy: str = "day",
+    limit: int = 366
+):
+    """Aggregate token usage from the daily rollups; start/end are inclusive YYYY-MM-DD dates"""
+    if groupBy not in GROUP_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"groupBy must be one of: {', '.join(GROUP_FIELDS)}"
+        )
+    
+    db = get_database()
+    if db is None:
+        return []
+    
+    # Include records still waiting in the in-memory buffer.
+    await usage_meter.flush()
+    
+    match = {}
+    if userId:
+        match["userId"] = userId
+    if start or end:
+        match["day"] = {}
+        if start:
+            match["day"]["$gte"] = start
+        if end:
+            match["day"]["$lte"] = end
+    
+    fields = GROUP_FIELDS[groupBy]
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {field: f"${field}" for field in fields},
+            "requests": {"$sum": "$requests"},
+            "errors": {"$sum": "$errors"},
+            "cached_requests": {"$sum": "$cached_requests"},
+            "prompt_tokens": {"$sum": "$prompt_tokens"},
+            "completion_tokens": {"$sum": "$completion_tokens"},
+            "total_tokens": {"$sum": "$total_tokens"},
+            "latency_ms": {"$sum": "$latency_ms"}
+        }},
+        {"$sort": {f"_id.{field}": 1 for field in fields}},
+        {"$limit": limit}
+    ]
+    totals = await db.usage_daily.aggregate(pipeline).to_list(limit)
+    
+    return [
+        UsageTotalsSchema(
+            key=total["_id"],
+            requests=total["requests"],
+            errors=total["errors"],
+            cached_requests=total["cached_requests"],
+            prompt_tokens=total["prompt_tokens"],
+            completion_tokens=total["completion_tokens"],
+            total_tokens=total["total_tokens"],
+            avg_latency_ms=round(total["latency_ms"] / total["requests"], 1) if total["requests"] else 0.0
+        )
+        for total in totals
+    ]
+
+@router.get("/meter")
+async def get_meter_stats():
+    return usage_meter.get_stats()